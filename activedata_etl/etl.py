@@ -20,15 +20,16 @@ from activedata_etl.transforms import Transform
 from jx_elasticsearch import elasticsearch
 from jx_elasticsearch.rollover_index import RolloverIndex
 from jx_python import jx
-from mo_dots import coalesce, listwrap, Data, Null, wrap, is_data
-from mo_future import text
+from mo_dots import coalesce, listwrap, Data, Null, wrap, is_data, set_default
+from mo_future import text, first
 from mo_hg.hg_mozilla_org import HgMozillaOrg
+from mo_http.http import CIRCUIT_OPEN
 from mo_kwargs import override
 from mo_logs import Log, startup, constants, strings
 from mo_logs.exceptions import suppress_exception, Except
 from mo_math import MIN
 from mo_testing import fuzzytestcase
-from mo_threads import Thread, Signal, Queue, Lock, Till, MAIN_THREAD
+from mo_threads import Thread, Signal, Queue, Lock, Till, MAIN_THREAD, Process
 from mo_times import Timer, Date, SECOND
 from pyLibrary import aws
 from pyLibrary.aws.s3 import strip_extension, key_prefix, KEY_IS_WRONG_FORMAT
@@ -36,6 +37,8 @@ from pyLibrary.meta import MemorySample
 from tuid.client import TuidClient
 
 EXTRA_WAIT_TIME = 20 * SECOND  # WAIT TIME TO SEND TO AWS, IF WE wait_forever
+CIRCUIT_PAUSE = 10  # SECONDS TO WAIT AFTER A REMOTE SERVICE CUT US OFF, BEFORE TAKING MORE WORK
+CHILD_STOP_TIMEOUT = 60  # SECONDS TO WAIT FOR A CHILD PROCESS TO STOP, BEFORE KILLING IT
 
 
 class ConcatSources(object):
@@ -179,14 +182,15 @@ class ETL(Thread):
                     self.resources
                 )
 
-                with Timer("process {{action}} for {{source}} ", param={"action": action.name, "source": source_key}):
-                    new_keys = action._transformer(
-                        source_key,
-                        source,
-                        action._destination,
-                        resources=resources,
-                        please_stop=self.please_stop
-                    )
+                with get_limiter(action).acquire(self.please_stop):
+                    with Timer("process {{action}} for {{source}} ", param={"action": action.name, "source": source_key}):
+                        new_keys = action._transformer(
+                            source_key,
+                            source,
+                            action._destination,
+                            resources=resources,
+                            please_stop=self.please_stop
+                        )
 
                 if new_keys == None:
                     new_keys = set()
@@ -219,19 +223,25 @@ class ETL(Thread):
                         if i != eid:
                             Log.error("expecting keys to be contiguous: {{ids}}", ids=etl_ids)
                     # VERIFY KEYS EXIST
-                    if hasattr(action._destination, "get_key"):
+                    if hasattr(action._destination, "verify_keys"):
+                        action._destination.verify_keys(new_keys)
+                    elif hasattr(action._destination, "get_key"):
                         for k in new_keys:
                             action._destination.get_key(k)
 
-                for n in action._notify:
-                    for k in new_keys:
-                        now = Date.now()
-                        n.add({
+                if action._notify:
+                    now = Date.now()
+                    messages = [
+                        {
                             "bucket": action._destination.bucket.name,
                             "key": k,
                             "timestamp": now.unix,
                             "date/time": now.format()
-                        })
+                        }
+                        for k in new_keys
+                    ]
+                    for n in action._notify:
+                        n.extend(messages)
 
                 if action.transform_type == "bulk":
                     continue
@@ -244,14 +254,16 @@ class ETL(Thread):
                 # WE DO NOT PUT KEYS ON WORK QUEUE IF ALREADY NOTIFYING SOME OTHER
                 # AND NOT GOING TO AN S3 BUCKET
                 if not action._notify and isinstance(action._destination, (aws.s3.Bucket, S3Bucket)):
-                    for k in old_keys | new_keys:
-                        now = Date.now()
-                        self.work_queue.add({
+                    now = Date.now()
+                    self.work_queue.extend(
+                        {
                             "bucket": action.destination.bucket,
                             "key": k,
                             "timestamp": now.unix,
                             "date/time": now.format()
-                        })
+                        }
+                        for k in old_keys | new_keys
+                    )
             except Exception as e:
                 e = Except.wrap(e)
                 if "Key {{key}} does not exist" in e:
@@ -314,6 +326,9 @@ class ETL(Thread):
                         is_ok = self._dispatch_work(todo)
                         if is_ok:
                             self.work_queue.commit()
+                        elif isinstance(self.work_queue, aws.Queue):
+                            # NOT FOR THIS PROCESS; DO NOT RE-WRITE IT, LET IT REAPPEAR AFTER THE VISIBILITY TIMEOUT
+                            self.work_queue.release()
                         else:
                             self.work_queue.rollback()
                     except Exception as e:
@@ -322,6 +337,11 @@ class ETL(Thread):
                         if "Shutdown detected." in e:
                             self.work_queue.rollback()
                             continue
+                        if CIRCUIT_OPEN in e:
+                            # A REMOTE SERVICE IS DOWN, NOT THE FAULT OF todo; DO NOT COUNT THE ATTEMPT
+                            self.work_queue.rollback()
+                            (Till(seconds=CIRCUIT_PAUSE) | please_stop).wait()
+                            continue
 
                         previous_attempts = coalesce(todo.previous_attempts, 0)
                         todo.previous_attempts = previous_attempts + 1
@@ -365,6 +385,56 @@ class ETL(Thread):
             raise e
 
 
+class Limiter(object):
+    """
+    LIMIT THE NUMBER OF THREADS THAT MAY RUN AN ACTION AT ONCE
+    """
+
+    def __init__(self, name, max_threads):
+        self.locker = Lock("limit for " + name)
+        self.max_threads = max_threads
+        self.running = 0
+
+    def acquire(self, please_stop):
+        return _Limited(self, please_stop)
+
+
+class _Limited(object):
+    def __init__(self, limiter, please_stop):
+        self.limiter = limiter
+        self.please_stop = please_stop
+
+    def __enter__(self):
+        limiter = self.limiter
+        with limiter.locker:
+            while limiter.max_threads and limiter.running >= limiter.max_threads:
+                if self.please_stop:
+                    Log.error("Shutdown detected. Stopping before start")
+                limiter.locker.wait(till=self.please_stop)
+            limiter.running += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        with self.limiter.locker:
+            self.limiter.running -= 1
+
+
+limiters_locker = Lock()
+limiters = {}  # MAP FROM action NAME TO Limiter, SHARED BY ALL ETL THREADS
+
+
+def get_limiter(action):
+    """
+    :param action: THE WORKER SETTINGS, WITH OPTIONAL max_threads
+    :return: THE Limiter FOR THIS ACTION
+    """
+    with limiters_locker:
+        limiter = limiters.get(action.name)
+        if limiter is None:
+            limiter = limiters[action.name] = Limiter(action.name, action.max_threads)
+        return limiter
+
+
 sinks_locker = Lock()
 sinks = []  # LIST OF (settings, sink) PAIRS
 
@@ -431,6 +501,13 @@ def main():
                 "type": str,
                 "dest": "id",
                 "required": False
+            },
+            {
+                "name": ["--process"],
+                "help": "name of the process (from param.processes) to run as",
+                "type": str,
+                "dest": "process",
+                "required": False
             }
         ])
         constants.set(settings.constants)
@@ -440,6 +517,12 @@ def main():
             etl_one(settings)
             return
 
+        if settings.param.processes:
+            if not settings.args.process:
+                run_processes(settings)
+                return
+            setup_process(settings)
+
         resources = Data(
             hg=HgMozillaOrg(use_cache=True, kwargs=settings.hg),
             local_es_node=settings.local_es_node,
@@ -466,6 +549,107 @@ def main():
         # write_profile(Data(filename="startup.tab"), [pstats.Stats(cprofiler)])
 
 
+def run_processes(settings):
+    """
+    START A CHILD ETL PROCESS FOR EACH OF param.processes, EACH WITH
+    ITS OWN RESOURCES, PULLING FROM THE SAME WORK QUEUE
+    """
+    _check_processes(settings)
+    stopper = Signal("main stop signal")
+    for p in settings.param.processes:
+        for i in range(coalesce(p.count, 1)):
+            name = p.name + "." + text(i)
+            params = [sys.executable] + sys.argv + ["--process=" + name]
+            Thread.run("supervise " + name, _supervise, name, params, please_stop=stopper)
+
+    aws.capture_termination_signal(stopper)
+    MAIN_THREAD.wait_for_shutdown_signal(stopper, allow_exit=True)
+
+
+def _supervise(name, params, please_stop):
+    """
+    RUN THE CHILD PROCESS, RESTART IT IF IT DIES
+    """
+    while not please_stop:
+        process = Process("etl " + name, params)
+        try:
+            while not process.service_stopped and not please_stop:
+                _drain(process)
+                (Till(seconds=1) | process.service_stopped | please_stop).wait()
+
+            if not process.service_stopped:
+                # THE CHILD STOPS ON "exit", GIVING IT A CHANCE TO ROLLBACK THE MESSAGES IT HOLDS
+                process.stdin.add("exit")
+                timeout = Till(seconds=CHILD_STOP_TIMEOUT)
+                while not process.service_stopped and not timeout:
+                    _drain(process)
+                    (Till(seconds=1) | process.service_stopped | timeout).wait()
+        finally:
+            if not process.service_stopped:
+                Log.warning("ETL process {{name|quote}} did not stop, killing it", name=name)
+                process.stop()
+        process.join()
+
+        if not please_stop:
+            Log.warning(
+                "ETL process {{name|quote}} stopped with returncode={{code}}, restarting",
+                name=name,
+                code=process.returncode
+            )
+            (Till(seconds=EXTRA_WAIT_TIME.seconds) | please_stop).wait()
+
+
+def _drain(process):
+    # Process ALREADY LOGS THE CHILD OUTPUT
+    process.stdout.pop_all()
+    process.stderr.pop_all()
+
+
+def _check_processes(settings):
+    """
+    THE FIRST GROUP TO HANDLE A MESSAGE DELETES IT, SO ALL THE WORKERS FOR A
+    SOURCE BUCKET MUST BE IN ONE GROUP, UNLESS THE GROUPS HAVE THEIR OWN QUEUES
+    """
+    owners = {}  # MAP FROM (queue name, source bucket) TO GROUP NAME
+    for p in settings.param.processes:
+        queue = coalesce(p.work_queue.name, settings.work_queue.name)
+        for w in settings.workers:
+            if p.workers and w.name not in p.workers:
+                continue
+            owner = owners.setdefault((queue, w.source.bucket), p.name)
+            if owner != p.name:
+                Log.error(
+                    "Worker {{worker|quote}} in process {{name|quote}} reads {{bucket|quote}} from {{queue|quote}}, like process {{owner|quote}}. Put them in the same process, or give one its own work_queue",
+                    worker=w.name,
+                    name=p.name,
+                    bucket=w.source.bucket,
+                    queue=queue,
+                    owner=owner
+                )
+
+
+def setup_process(settings):
+    """
+    CONFIGURE settings FOR THE CHILD PROCESS NAMED IN --process
+    """
+    _check_processes(settings)
+    group_name = settings.args.process.split(".")[0]
+    group = first(p for p in settings.param.processes if p.name == group_name)
+    if not group:
+        Log.error("Can not find process {{name|quote}} in param.processes", name=group_name)
+
+    if group.workers:
+        settings.workers = [w for w in settings.workers if w.name in group.workers]
+    settings.param.threads = coalesce(group.threads, settings.param.threads)
+    if group.work_queue:
+        # THIS GROUP HAS ITS OWN QUEUE, SO EVERYTHING ON IT IS FOR THIS GROUP
+        settings.work_queue = set_default({}, group.work_queue, settings.work_queue)
+    else:
+        # OTHER PROCESSES HANDLE THE WORK THIS ONE DOES NOT
+        settings.param.keep_unknown_on_queue = True
+    settings.param.processes = None
+
+
 def etl_one(settings):
     # where queue is first created/called
     queue = Queue("temp work queue", max=2 ** 32)
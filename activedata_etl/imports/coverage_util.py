@@ -12,6 +12,7 @@ from __future__ import unicode_literals
 from jx_python import jx
 from mo_dots import listwrap
 from mo_logs import Log, Except
+from mo_logs.exceptions import suppress_exception
 from mo_times import Timer
 from mo_http import http
 
@@ -33,20 +34,32 @@ def tuid_batches(source_key, task_cluster_record, resources, iterator, path="fil
             s[path].total_covered != 0 or s[path].total_uncovered != 0
         )
 
-    def _annotate_sources(sources):
+    branch = task_cluster_record.repo.branch.name
+    revision = task_cluster_record.repo.changeset.id[:12]
+
+    def _request_tuids(sources):
+        """
+        :param sources: LIST OF COVERAGE SOURCE STRUCTURES TO MARKUP
+        :return: Thread THAT WILL RETURN THE TUIDS, OR None IF NOTHING TO ASK
+        """
+        filenames = [s[path].name for s in listwrap(sources) if has_tuids(s)]
+        if not filenames:
+            return None
+        return resources.tuid_mapper.prefetch(branch, revision, filenames)
+
+    def _annotate_sources(sources, request):
         """
         :param sources: LIST OF COVERAGE SOURCE STRUCTURES TO MARKUP
+        :param request: THE Thread FROM _request_tuids(sources)
         :return: NOTHING, sources ARE MARKED UP
         """
+        if request is None:
+            return
         try:
-            branch = task_cluster_record.repo.branch.name
-            revision = task_cluster_record.repo.changeset.id[:12]
             sources = listwrap(sources)
-            filenames = [s[path].name for s in sources if has_tuids(s)]
-
-            with Timer("markup sources for {{num}} files", {"num": len(filenames)}, too_long=1):
+            with Timer("markup sources for {{num}} records", {"num": len(sources)}, too_long=1):
                 # WHAT DO WE HAVE
-                found = resources.tuid_mapper.get_tuids(branch, revision, filenames)
+                found = request.join()
                 if found == None:
                     return  # THIS IS A FAILURE STATE, AND A WARNING HAS ALREADY BEEN RAISED, DO NOTHING
 
@@ -66,16 +79,18 @@ def tuid_batches(source_key, task_cluster_record, resources, iterator, path="fil
                     if not has_tuids(source):
                         continue
                     line_to_tuid = found.get(source[path].name)
-                    if line_to_tuid != None:
+                    if line_to_tuid is not None:
+                        # array OF TUIDS, 0 FOR LINES WITHOUT ONE
+                        num_lines = len(line_to_tuid)
                         source[path].tuid_covered = [
                             line_to_tuid[line]
                             for line in source.file.covered
-                            if line_to_tuid[line]
+                            if 0 <= line < num_lines and line_to_tuid[line]
                         ]
                         source[path].tuid_uncovered = [
                             line_to_tuid[line]
                             for line in source.file.uncovered
-                            if line_to_tuid[line]
+                            if 0 <= line < num_lines and line_to_tuid[line]
                         ]
         except Exception as e:
             e = Except.wrap(e)
@@ -87,10 +102,26 @@ def tuid_batches(source_key, task_cluster_record, resources, iterator, path="fil
                     cause=e
                 )
 
-    for g, records in jx.chunk(iterator, size=TUID_BLOCK_SIZE):
-        _annotate_sources(records)
-        for r in records:
-            yield r
+    # ASK FOR THE TUIDS OF THE NEXT BLOCK BEFORE MARKING UP (AND YIELDING) THIS ONE
+    pending = None
+    try:
+        for g, records in jx.chunk(iterator, size=TUID_BLOCK_SIZE):
+            previous, pending = pending, (records, _request_tuids(records))
+            if previous:
+                _annotate_sources(*previous)
+                for r in previous[0]:
+                    yield r
+        if pending:
+            records, request = pending
+            pending = None
+            _annotate_sources(records, request)
+            for r in records:
+                yield r
+    finally:
+        if pending and pending[1]:
+            # CALLER STOPPED EARLY, DO NOT LEAVE THE REQUEST UN-JOINED
+            with suppress_exception:
+                pending[1].join()
 
 
 def download_file(url, destination):
@@ -10,6 +10,7 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import re
+from calendar import timegm
 from copy import copy
 
 import mo_math
@@ -22,13 +23,14 @@ from mo_json import json2value
 from mo_logs import Log, strings
 from mo_logs.exceptions import Except
 from mo_math import MAX, MIN
-from mo_times.dates import Date, unicode2Date
+from mo_times.dates import Date, unicode2Date, unix2Date
 from mo_times.durations import SECOND, MINUTE, HOUR, DAY
 from pyLibrary.convert import quote2string
 
 DEBUG = False
 MAX_TIMING_ERROR = SECOND  # SOME TIMESTAMPS ARE ONLY ACCURATE TO ONE SECOND
 MAX_HARNESS_TIMING_ERROR = 5 * MINUTE
+MAX_HEAD_LINES = 1000  # LINES OF TASKCLUSTER HEADER TO KEEP, LOOKING FOR "=== Task Starting ==="
 
 
 def process_tc_live_backing_log(source_key, all_log_lines, from_url, task_record):
@@ -87,10 +89,10 @@ def process_tc_live_backing_log(source_key, all_log_lines, from_url, task_record
             continue
 
         try:
-            prefix = strings.between(log_line, "[", "]")
+            prefix = log_line.startswith("[") and strings.between(log_line, "[", "]")
             if prefix and log_line.startswith("[" + prefix):
                 prefix_words = prefix.split(' ')
-                tc_timestamp = Date(' '.join(prefix_words[1:]))
+                tc_timestamp = tc_timestamp2Date(' '.join(prefix_words[1:]))
                 step_name = prefix_words[0]
                 curr_line = log_line[len(prefix) + 3:]
 
@@ -169,6 +171,10 @@ def process_tc_live_backing_log(source_key, all_log_lines, from_url, task_record
                         continue
                 except Exception as e:
                     Log.warning("Expecting JSON header at url={{url}}", url=from_url, cause=e)
+            elif len(accumulate_head) >= MAX_HEAD_LINES:
+                # NO END OF HEADER IN SIGHT, DO NOT KEEP THE WHOLE LOG IN MEMORY
+                process_head = False
+                accumulate_head = None
             else:
                 accumulate_head.append(curr_line)
             try:
@@ -259,6 +265,40 @@ def process_tc_live_backing_log(source_key, all_log_lines, from_url, task_record
     return action
 
 
+TC_TIMESTAMP = re.compile(r"(\d\d\d\d-\d\d-\d\d)[ T](\d\d:\d\d:\d\d)(?:\.(\d+))?Z?$")
+_last_second = (None, None)  # (PREFIX, SECONDS) OF THE LAST TIMESTAMP PARSED
+
+
+def tc_timestamp2Date(value, format=None):
+    """
+    FAST PARSE OF THE TIMESTAMPS FOUND IN TASKCLUSTER LOGS
+        2016-10-04 17:09:02.626Z
+        2016-10-04T17:09:03.770657Z
+    LOG LINES ARE IN ORDER, SO THE SECONDS OF THE LAST PREFIX ARE REMEMBERED
+
+    :param value: TIMESTAMP STRING (UTC)
+    :param format: FOR THE GENERIC PARSER, IF THIS IS NOT A KNOWN FORMAT
+    :return: Date
+    """
+    global _last_second
+
+    match = TC_TIMESTAMP.match(value)
+    if not match:
+        if format:
+            return unicode2Date(value, format=format)
+        return Date(value)
+    day, time, fraction = match.groups()
+
+    prefix = day + " " + time
+    last_prefix, seconds = _last_second
+    if prefix != last_prefix:
+        seconds = timegm((int(day[0:4]), int(day[5:7]), int(day[8:10]), int(time[0:2]), int(time[3:5]), int(time[6:8])))
+        _last_second = (prefix, seconds)
+
+    microseconds = int((fraction + "000000")[:6]) if fraction else 0
+    return unix2Date((seconds * 1000000 + microseconds) / 1000000)
+
+
 def process_text_log(all_log_lines, from_url, source_key):
     """
     Buildbot logs:
@@ -448,6 +488,7 @@ def process_text_log(all_log_lines, from_url, source_key):
 
 
 
+NEW_MOZLOG_LITERAL = "INFO - [mozharness: "  # CHEAP TEST BEFORE THE REGEX
 NEW_MOZLOG_STEP = re.compile(r"\d\d:\d\d:\d\d     INFO - \[mozharness\: (.*)Z\] .*")
 NEW_MOZLOG_START_STEP = re.compile(r"\d\d:\d\d:\d\d     INFO - \[mozharness\: (.*)Z\] (Running|Skipping) (.*) step.")
 NEW_MOZLOG_END_STEP = [
@@ -485,7 +526,7 @@ class NewHarnessLines(object):
         12:23:12     INFO - [mozharness: 2016-11-10 20:23:12.172233Z] Finished run-tests step (success)
         """
 
-        if not NEW_MOZLOG_STEP.match(curr_line):
+        if NEW_MOZLOG_LITERAL not in curr_line or not NEW_MOZLOG_STEP.match(curr_line):
             return None
 
         match = NEW_MOZLOG_START_STEP.match(curr_line)
@@ -514,7 +555,7 @@ class NewHarnessLines(object):
         return None
 
     def utc_to_timestamp(self, _utc_time, last_timestamp):
-        timestamp = unicode2Date(_utc_time, format="%Y-%m-%d %H:%M:%S.%f")
+        timestamp = tc_timestamp2Date(_utc_time, format="%Y-%m-%d %H:%M:%S.%f")
         # if last_timestamp == None:
         #     last_timestamp = timestamp
         # elif timestamp < last_timestamp - 12 * HOUR - MAX_HARNESS_TIMING_ERROR:
@@ -196,6 +196,9 @@ def main():
                     rollover_max=w.rollover.max,
                     queue_size=coalesce(w.queue_size, 1000),
                     batch_size=unwrap(w.batch_size),
+                    num_senders=coalesce(w.num_senders, 1),
+                    batch_bytes=coalesce(w.batch_bytes, 10 * 1000 * 1000),
+                    queue_bytes=coalesce(w.queue_bytes, 200 * 1000 * 1000),
                     kwargs=w.elasticsearch
                 ),
                 bucket=s3.Bucket(w.source),
@@ -214,6 +217,14 @@ def main():
         def monitor_progress(please_stop):
             while not please_stop:
                 Log.note("Remaining in SQS: {{num}}", num=len(main_work_queue))
+                for w in split.values():
+                    for index, stats in w.es.stats.items():
+                        Log.note(
+                            "{{index}}: {{bytes_per_second|round(places=3)}} bytes/second, batches of {{batch_bytes}} bytes",
+                            index=index,
+                            bytes_per_second=stats["bytes_per_second"],
+                            batch_bytes=stats["batch_bytes"]
+                        )
                 (please_stop | Till(seconds=10)).wait()
 
         Thread.run(name="monitor progress", target=monitor_progress, please_stop=please_stop)
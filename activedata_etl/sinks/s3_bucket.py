@@ -8,13 +8,14 @@
 #
 from __future__ import unicode_literals
 
+from itertools import chain
 from math import log10
 
 from activedata_etl import etl2key, key2etl
 from activedata_etl.s3_clear import Version
 from mo_collections import UniqueIndex
 from mo_dots import wrap
-from mo_future import text
+from mo_future import long, text, xrange
 from mo_json import json2value, value2json
 from mo_kwargs import override
 from mo_logs import Log
@@ -23,6 +24,8 @@ from mo_times.timer import Timer
 from pyLibrary.aws import s3
 from pyLibrary.aws.s3 import key_prefix
 
+IDS_METADATA = "etl-ids"  # S3 METADATA WITH THE RANGE OF etl.id IN THE KEY
+
 
 class S3Bucket(object):
 
@@ -73,7 +76,12 @@ class S3Bucket(object):
                     self.bucket.bucket.delete_key(k.name)
             return maxi
 
-    def extend(self, documents, overwrite=False):
+    def extend(self, documents, overwrite=False, envelope=None):
+        """
+        :param documents: LIST OF {"id": key, "value": document}
+        :param overwrite: True TO IGNORE ANY EXISTING DOCUMENTS
+        :param envelope: OPTIONAL mo_json.Envelope WITH PROPERTIES SHARED BY ALL documents
+        """
         parts = {}
         for d in wrap(documents):
             parent_key = etl2key(key2etl(d.id).source)
@@ -82,21 +90,28 @@ class S3Bucket(object):
             sub.append(d.value)
 
         for k, docs in parts.items():
-            self._extend(k, docs, overwrite=overwrite)
+            self._extend(k, docs, overwrite=overwrite, envelope=envelope)
 
         return set(parts.keys())
 
     def write_lines(self, key, lines):
         self.bucket.write_lines(key, lines)
 
-    def _extend(self, key, documents, overwrite=False):
+    def _extend(self, key, documents, overwrite=False, envelope=None):
         if overwrite:
-            self.bucket.write_lines(key, (value2json(d) for d in documents))
+            self._write(key, documents, envelope)
             return
 
         meta = self.bucket.get_meta(key)
         if meta != None:
             documents = UniqueIndex(keys="etl.id", data=documents)
+            old_ids = _decode_ids(self.bucket.bucket.get_key(meta.key).get_metadata(IDS_METADATA))
+            new_ids = set(d.etl.id for d in documents)
+            if old_ids and all(i in new_ids for i in old_ids):
+                # ALL OLD RECORDS ARE REPLACED, NO NEED TO READ THEM
+                self._write(key, documents, envelope)
+                return
+
             try:
                 content = self.bucket.read_lines(key)
                 old_docs = UniqueIndex(keys="etl.id", data=list(map(json2value, content)))
@@ -113,10 +128,44 @@ class S3Bucket(object):
             # fuzzytestcase.assertAlmostEqual(documents._data, overlap._data)
 
             if residual:
-                documents = documents | residual
-
-        self.bucket.write_lines(key, (value2json(d) for d in documents))
+                # OLD DOCUMENTS ARE ALREADY COMPLETE, THEY DO NOT GO IN THE envelope
+                self._write(key, documents, envelope, residual)
+                return
+
+        self._write(key, documents, envelope)
+
+    def _write(self, key, documents, envelope=None, residual=None):
+        documents = list(documents)
+        residual = list(residual or [])
+        encode = envelope.encode if envelope else value2json
+        self.bucket.write_lines(
+            key,
+            chain((encode(d) for d in documents), (value2json(d) for d in residual)),
+            metadata={IDS_METADATA: _encode_ids(d.etl.id for d in documents + residual)}
+        )
 
     def add(self, doc):
         Log.error("Not supported")
 
+
+def _encode_ids(ids):
+    """
+    :return: "min..max" IF ids ARE CONTIGUOUS INTEGERS, OTHERWISE ""
+    """
+    ids = set(ids)
+    if not ids or not all(isinstance(i, (int, long)) for i in ids):
+        return ""
+    min_, max_ = min(ids), max(ids)
+    if max_ - min_ + 1 != len(ids):
+        return ""
+    return text(min_) + ".." + text(max_)
+
+
+def _decode_ids(value):
+    """
+    :return: THE range OF ids ENCODED BY _encode_ids(), OR None IF UNKNOWN
+    """
+    if not value:
+        return None
+    min_, max_ = map(int, value.split(".."))
+    return xrange(min_, max_ + 1)
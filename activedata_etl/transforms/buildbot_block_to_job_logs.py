@@ -16,7 +16,6 @@ from activedata_etl.transforms.pulse_block_to_job_logs import verify_equal, proc
 from jx_elasticsearch import elasticsearch
 from mo_dots import Data, set_default
 from mo_dots import coalesce
-from mo_hg.hg_mozilla_org import minimize_repo
 from mo_json import json2value
 from mo_logs import Log
 from mo_logs.exceptions import Except
@@ -66,7 +65,7 @@ def process(source_key, source, dest_bucket, resources, please_stop=None):
                 changeset={"id": data.build.revision},
                 branch={"name": data.build.branch, "locale": data.build.locale}
             )
-            data.repo = minimize_repo(resources.hg.get_revision(rev))
+            data.repo = resources.hg.get_minimal_revision(rev)
             data.build.date = coalesce(data.build.date, data.repo.changeset.date)
         except Exception as e:
             if data.action.start_time > Date.today()-MONTH:
@@ -19,7 +19,7 @@ from activedata_etl.transforms import ACTIVE_DATA_QUERY
 from mo_dots import set_default, Null
 from mo_files import File, TempDirectory
 from mo_future import text
-from mo_json import json2value, value2json
+from mo_json import Envelope, json2value
 from mo_logs import Log, machine_metadata
 from mo_threads import Process, Till
 from mo_times import Timer, Date
@@ -80,7 +80,7 @@ def unzip_files(gcno_file, gcda_file, dest_dir):
 def process_directory(source_key, tmpdir, gcno_file, gcda_file, destination, task_cluster_record, file_etl, please_stop):
 
     file_id = etl2key(file_etl)
-    new_record = set_default(
+    envelope = Envelope(set_default(
         {
             "test": {
                 "suite": task_cluster_record.run.suite.name,
@@ -94,7 +94,7 @@ def process_directory(source_key, tmpdir, gcno_file, gcda_file, destination, tas
             }
         },
         task_cluster_record
-    )
+    ))
 
     def generator():
         count = 0
@@ -121,13 +121,15 @@ def process_directory(source_key, tmpdir, gcno_file, gcda_file, destination, tas
                 continue
             if IGNORE_METHOD_COVERAGE and source.file.total_covered == None:
                 continue
-            new_record.source = source
-            new_record.etl.id = count
-            new_record._id = file_id + "." + text(count)
+            line = envelope.encode({
+                "source": source,
+                "etl": {"id": count},
+                "_id": file_id + "." + text(count)
+            })
             count += 1
             if DEBUG and (count % 10000 == 0):
-                Log.note("Processed {{num}} coverage records\n{{example}}", num=count, example=value2json(new_record))
-            yield value2json(new_record)
+                Log.note("Processed {{num}} coverage records\n{{example}}", num=count, example=line)
+            yield line
 
     with Timer("Processing gcno/gcda in {{temp_dir}} for key {{key}}", param={"temp_dir": tmpdir, "key": source_key}):
         destination.write_lines(file_id, generator())
@@ -16,7 +16,7 @@ from activedata_etl.imports.coverage_util import download_file, LANGUAGE_MAPPING
 from mo_dots import wrap, set_default
 from mo_files import TempFile
 from mo_future import NEXT
-from mo_json import stream, value2json
+from mo_json import Envelope, stream
 from mo_logs import Log, machine_metadata
 from mo_times.dates import Date
 from mo_times.timer import Timer
@@ -38,7 +38,7 @@ def process_per_test_artifact(source_key, resources, destination, task_cluster_r
             urls_w_uncoverable_lines.add(artifact.url)
             Log.warning("per-test-coverage {{url}} has uncoverable lines", url=artifact.url)
 
-        new_record = set_default(
+        new_record = wrap(
             {
                 "source": {
                     "language": [lang for lang, extensions in LANGUAGE_MAPPINGS if filename.endswith(extensions)],
@@ -60,8 +60,7 @@ def process_per_test_artifact(source_key, resources, destination, task_cluster_r
                     "machine": machine_metadata,
                     "timestamp": Date.now()
                 }
-            },
-            task_cluster_record
+            }
         )
 
         return new_record
@@ -198,9 +197,10 @@ def process_per_test_artifact(source_key, resources, destination, task_cluster_r
             download_file(artifact.url, temp_file.abspath)
 
         key = etl2key(artifact_etl)
+        envelope = Envelope(task_cluster_record)
         with Timer("Processing per-test reports for key {{key}}", param={"key": key}):
             destination.write_lines(
-                key, map(value2json, tuid_batches(
+                key, map(envelope.encode, tuid_batches(
                     source_key,
                     task_cluster_record,
                     resources,
@@ -31,8 +31,7 @@ from mo_dots import (
 from mo_future import text
 from mo_json import json2value
 from mo_logs import Log
-from mo_math import MIN, MAX
-from mo_math.stats import ZeroMoment2Stats, ZeroMoment
+from mo_math.stats import ZeroMoment2Stats, summarize
 from mo_threads import Lock
 from mo_times.dates import Date
 from pyLibrary.env import git
@@ -252,55 +251,44 @@ def transform(source_key, perfherder, metadata, resources):
 
         total = FlatList()
 
+        # (given_values, test, result properties) FOR EACH RECORD, SO THE STATS ARE DONE IN ONE BATCH
+        todo = []
         if perfherder.subtests:
             if suite_name in ["dromaeo_css", "dromaeo_dom"]:
                 # dromaeo IS SPECIAL, REPLICATES ARE IN SETS OF FIVE
                 for i, subtest in enumerate(perfherder.subtests):
                     subtest_template = scrub_subtest(subtest)
                     for g, sub_replicates in jx.chunk(subtest.replicates, size=5):
-                        new_record = set_default(
-                            {
-                                "result": set_default(
-                                    stats(
-                                        source_key,
-                                        sub_replicates,
-                                        subtest.name,
-                                        suite_name,
-                                    ),
-                                    {
-                                        "test": text(subtest.name)
-                                        + "."
-                                        + text(g),
-                                        "ordering": i,
-                                    },
-                                    subtest_template,
-                                    result_template,
-                                )
-                            },
-                            metadata,
-                        )
-                        new_records.append(new_record)
-                        total.append(new_record.result.stats)
-            else:
-                for i, subtest in enumerate(perfherder.subtests):
-                    subtest_template = scrub_subtest(subtest)
-                    samples = coalesce(subtest.replicates, [subtest.value])
-                    new_record = set_default(
-                        {
-                            "result": set_default(
-                                stats(source_key, samples, subtest.name, suite_name),
+                        todo.append((
+                            sub_replicates,
+                            subtest.name,
+                            [
                                 {
+                                    "test": text(subtest.name)
+                                    + "."
+                                    + text(g),
                                     "ordering": i,
-                                    "value": samples[0] if len(samples) == 1 else None,
                                 },
                                 subtest_template,
                                 result_template,
-                            )
-                        },
-                        metadata,
-                    )
-                    new_records.append(new_record)
-                    total.append(new_record.result.stats)
+                            ]
+                        ))
+            else:
+                for i, subtest in enumerate(perfherder.subtests):
+                    subtest_template = scrub_subtest(subtest)
+                    samples = coalesce(subtest.replicates, [subtest.value])
+                    todo.append((
+                        samples,
+                        subtest.name,
+                        [
+                            {
+                                "ordering": i,
+                                "value": samples[0] if len(samples) == 1 else None,
+                            },
+                            subtest_template,
+                            result_template,
+                        ]
+                    ))
 
         elif perfherder.results:
             # RECORD TEST RESULTS
@@ -309,59 +297,36 @@ def transform(source_key, perfherder, metadata, resources):
                 # RECORD ALL RESULTS
                 for i, (test_name, replicates) in enumerate(perfherder.results.items()):
                     for g, sub_replicates in jx.chunk(replicates, size=5):
-                        new_record = set_default(
-                            {
-                                "result": set_default(
-                                    stats(
-                                        source_key,
-                                        sub_replicates,
-                                        test_name,
-                                        suite_name,
-                                    ),
-                                    {
-                                        "test": text(test_name) + "." + text(g),
-                                        "ordering": i,
-                                        "value": replicates[0] if len(sub_replicates) == 1 else None,
-                                    },
-                                    result_template,
-                                )
-                            },
-                            metadata,
-                        )
-                        new_records.append(new_record)
-                        total.append(new_record.result.stats)
-            else:
-                for i, (test_name, replicates) in enumerate(perfherder.results.items()):
-                    new_record = set_default(
-                        {
-                            "result": set_default(
-                                stats(source_key, replicates, test_name, suite_name),
+                        todo.append((
+                            sub_replicates,
+                            test_name,
+                            [
                                 {
-                                    "test": test_name,
+                                    "test": text(test_name) + "." + text(g),
                                     "ordering": i,
-                                    "value": replicates[0] if len(replicates) == 1 else None,
+                                    "value": replicates[0] if len(sub_replicates) == 1 else None,
                                 },
                                 result_template,
-                            )
-                        },
-                        metadata,
-                    )
-                    new_records.append(new_record)
-                    total.append(new_record.result.stats)
+                            ]
+                        ))
+            else:
+                for i, (test_name, replicates) in enumerate(perfherder.results.items()):
+                    todo.append((
+                        replicates,
+                        test_name,
+                        [
+                            {
+                                "test": test_name,
+                                "ordering": i,
+                                "value": replicates[0] if len(replicates) == 1 else None,
+                            },
+                            result_template,
+                        ]
+                    ))
+
         elif (perfherder.value != None):
             # SUITE CAN HAVE A SINGLE VALUE, AND NO SUB-TESTS
-            new_record = set_default(
-                {
-                    "result": set_default(
-                        stats(source_key, [perfherder.value], None, suite_name),
-                        {"value": perfherder.value},
-                        result_template,
-                    )
-                },
-                metadata,
-            )
-            new_records.append(new_record)
-            total.append(new_record.result.stats)
+            todo.append(([perfherder.value], None, [{"value": perfherder.value}, result_template]))
         elif perfherder.is_empty:
             metadata.run.result.is_empty = True
             new_records.append(metadata)
@@ -382,6 +347,13 @@ def transform(source_key, perfherder, metadata, resources):
                     name=suite_name,
                 )
 
+        if todo:
+            all_stats = many_stats(source_key, [(v, t) for v, t, _ in todo], suite_name)
+            for (_, _, templates), result in zip(todo, all_stats):
+                new_record = set_default({"result": set_default(result, *templates)}, metadata)
+                new_records.append(new_record)
+                total.append(new_record.result.stats)
+
         # ADD RECORD FOR GEOMETRIC MEAN SUMMARY
         metadata.run.stats = geo_mean(total)
         Log.note(
@@ -432,69 +404,89 @@ def stats(source_key, given_values, test, suite):
     samples - LIST OF VALUES USED IN AGGREGATE
     rejects - LIST OF VALUES NOT USED IN AGGREGATE
     """
-    try:
-        if given_values == None:
-            return None
-
-        rejects = unwraplist(
-            [
-                text(v)
-                for v in given_values
-                if mo_math.is_nan(v) or not mo_math.is_finite(v)
-            ]
-        )
-        clean_values = wrap(
-            [float(v) for v in given_values if not mo_math.is_nan(v) and mo_math.is_finite(v)]
-        )
+    return many_stats(source_key, [(given_values, test)], suite)[0]
 
-        z = ZeroMoment.new_instance(clean_values)
-        s = wrap(z.__data__())
-        for k, v in z.__data__().items():
-            s[k] = v
-        for k, v in ZeroMoment2Stats(z).items():
-            s[k] = v
-        s.max = MAX(clean_values)
-        s.min = MIN(clean_values)
-        s.median = mo_math.stats.median(clean_values, simple=False)
-        s.last = clean_values.last()
-        s.first = clean_values[0]
-        if mo_math.is_number(s.variance) and not mo_math.is_nan(s.variance):
-            s.std = sqrt(s.variance)
-
-        good_excuse = [
-            not rejects,
-            suite in ["basic_compositor_video"],
-            test in ["sessionrestore_no_auto_restore"],
-        ]
-
-        if not any(good_excuse):
-            Log.warning(
-                "{{test}} in suite {{suite}} in {{key}} has rejects {{samples|json}}",
-                test=test,
-                suite=suite,
-                key=source_key,
-                samples=given_values,
+
+def many_stats(source_key, series, suite):
+    """
+    stats() FOR EACH (given_values, test) PAIR IN series, ALL THE SERIES OF A
+    SUITE ARE SUMMARIZED IN ONE BATCH
+    """
+    output = [None] * len(series)
+    todo = []  # (INDEX, clean_values, rejects)
+    for i, (given_values, test) in enumerate(series):
+        try:
+            if given_values == None:
+                continue
+
+            rejects = unwraplist(
+                [
+                    text(v)
+                    for v in given_values
+                    if mo_math.is_nan(v) or not mo_math.is_finite(v)
+                ]
             )
+            clean_values = [float(v) for v in given_values if not mo_math.is_nan(v) and mo_math.is_finite(v)]
+
+            good_excuse = [
+                not rejects,
+                suite in ["basic_compositor_video"],
+                test in ["sessionrestore_no_auto_restore"],
+            ]
+
+            if not any(good_excuse):
+                Log.warning(
+                    "{{test}} in suite {{suite}} in {{key}} has rejects {{samples|json}}",
+                    test=test,
+                    suite=suite,
+                    key=source_key,
+                    samples=given_values,
+                )
+            todo.append((i, clean_values, rejects))
+        except Exception as e:
+            Log.warning("can not reduce series to moments", e)
+            output[i] = {}
 
-        return {"stats": s, "samples": clean_values, "rejects": rejects}
+    try:
+        summaries = summarize([clean_values for _, clean_values, _ in todo], simple=False)
     except Exception as e:
         Log.warning("can not reduce series to moments", e)
-        return {}
+        for i, _, _ in todo:
+            output[i] = {}
+        return output
+
+    for (i, clean_values, rejects), summary in zip(todo, summaries):
+        try:
+            z = summary.moment
+            s = wrap(z.__data__())
+            for k, v in ZeroMoment2Stats(z).items():
+                s[k] = v
+            s.max = summary.max
+            s.min = summary.min
+            s.median = summary.median
+            clean_values = wrap(clean_values)
+            s.last = clean_values.last()
+            s.first = clean_values[0]
+            if mo_math.is_number(s.variance) and not mo_math.is_nan(s.variance):
+                s.std = sqrt(s.variance)
+
+            output[i] = {"stats": s, "samples": clean_values, "rejects": rejects}
+        except Exception as e:
+            Log.warning("can not reduce series to moments", e)
+            output[i] = {}
+    return output
 
 
 def geo_mean(values):
     """
     GIVEN AN ARRAY OF dicts, CALC THE GEO-MEAN ON EACH ATTRIBUTE
     """
-    agg = Data()
+    agg = {}
     for d in values:
         for k, v in d.items():
             if v != 0:
-                acc = agg[k]
-                if acc == None:
-                    acc = agg[k] = ZeroMoment.new_instance()
-                acc += mo_math.log(mo_math.abs(v))
-    return {k: mo_math.exp(v.stats.mean) for k, v in agg.items()}
+                agg.setdefault(k, []).append(v)
+    return {k: mo_math.stats.geo_mean(v) for k, v in agg.items()}
 
 RAPTOR_BROWSERS = [
     "-chromium-cold",
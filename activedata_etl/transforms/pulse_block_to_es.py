@@ -13,7 +13,7 @@ from activedata_etl import etl2key
 from activedata_etl.imports.buildbot import BuildbotTranslator
 from activedata_etl.transforms import TRY_AGAIN_LATER
 from mo_dots import Data, Null
-from mo_hg.hg_mozilla_org import DEFAULT_LOCALE, minimize_repo
+from mo_hg.hg_mozilla_org import DEFAULT_LOCALE
 from mo_hg.repos.changesets import Changeset
 from mo_hg.repos.revisions import Revision
 from mo_json import json2value
@@ -98,7 +98,7 @@ def transform_buildbot(source_key, other, resources):
         rev = Revision(branch={"name": output.build.branch}, changeset=Changeset(id=output.build.revision))
         locale = output.build.locale.replace("en-US", DEFAULT_LOCALE)
         try:
-            output.repo = minimize_repo(resources.hg.get_revision(rev, locale))
+            output.repo = resources.hg.get_minimal_revision(rev, locale)
         except Exception as e:
             if "release-mozilla-esr" in e or "release-comm-esr" in e:
                 # TODO: FIX PROBLEM WHERE, FOR SOME REASON, WE CAN NOT FIND THE REVISIONS FOR ESR
@@ -9,6 +9,8 @@
 from __future__ import division
 from __future__ import unicode_literals
 
+import hashlib
+
 import mo_math
 import requests
 
@@ -25,36 +27,52 @@ from activedata_etl.transforms import (
     TC_MAIN_URL,
 )
 from jx_python import jx
-from mo_dots import set_default, Data, unwraplist, listwrap, wrap, coalesce, Null, is_data
+from mo_collections.lru import LRU
+from mo_dots import set_default, Data, unwraplist, listwrap, wrap, coalesce, Null, is_data, unwrap
 from mo_files import URL, mimetype
 from mo_future import text
-from mo_hg.hg_mozilla_org import minimize_repo
 from mo_json import json2value, value2json
 from mo_logs import Log, machine_metadata, strings
 from mo_logs.exceptions import suppress_exception, Except
-from mo_testing.fuzzytestcase import assertAlmostEqual
+from mo_threads import Queue, Signal, Thread, THREAD_STOP
 from mo_times.dates import Date
+from mo_times.durations import DAY
 from pyLibrary import convert
 from mo_http import http
 
 DEBUG = False
 DISABLE_LOG_PARSING = False
 MAX_THREADS = 5
+READ_AHEAD = MAX_THREADS  # NUMBER OF LINES TO FETCH BEFORE THEY ARE NEEDED
+
+SEEN_TASKS_SIZE = 100 * 1000  # NUMBER OF TASKS TO REMEMBER FOR DUPLICATE DETECTION
+SEEN_TASKS_AGE = DAY.seconds
 
-seen_tasks = {}
+SHAPES_SIZE = 10 * 1000  # NUMBER OF DISTINCT LEAF-PATH LISTS TO SHARE BETWEEN FINGERPRINTS
+
+seen_tasks = LRU(max_size=SEEN_TASKS_SIZE, max_age=SEEN_TASKS_AGE)  # MAP FROM task.id TO _fingerprint()
+_shapes = {}  # MOST TASKS HAVE THE SAME LEAF PATHS, SO KEEP ONE COPY OF EACH
 new_seen_tc_properties = set()
 
 
 def process(source_key, source, destination, resources, please_stop=None):
+    lines = list(enumerate(source.read_lines()))
+    fetcher = TaskFetcher(source_key, [line for _, line in lines])
+    try:
+        return _process(source_key, lines, fetcher, destination, resources, please_stop)
+    finally:
+        fetcher.close()
+
+
+def _process(source_key, lines, fetcher, destination, resources, please_stop):
     output = []
     source_etl = None
 
-    lines = list(enumerate(source.read_lines()))
-    session = requests.session()
     for line_number, line in lines:
         if please_stop:
             Log.error("Shutdown detected. Stopping early")
         try:
+            fetched = fetcher.get(line_number)
             tc_message = json2value(line)
             task_id = consume(tc_message, "status.taskId")  # context.taskId
             etl = consume(tc_message, "etl")
@@ -67,8 +85,7 @@ def process(source_key, source, destination, resources, please_stop=None):
                 num=line_number,
                 artifact=tc_message.artifact.name,
             )
-            task_url = strings.expand_template(TC_MAIN_URL, {"task_id": task_id})
-            task = http.get_json(task_url, retry=TC_RETRY, session=session)
+            task = _use(fetched, "task")
             if task.code == "ResourceNotFound":
                 Log.note(
                     "Can not find task {{task}} while processing key {{key}}",
@@ -102,8 +119,7 @@ def process(source_key, source, destination, resources, please_stop=None):
 
             # if not tc_message.status.runs.last().resolved:
             # UPDATE TASK STATUS (tc_message MAY BE OLD)
-            status_url = strings.expand_template(TC_STATUS_URL, {"task_id": task_id})
-            task_status = http.get_json(status_url, retry=TC_RETRY, session=session)
+            task_status = _use(fetched, "status")
             consume(task_status, "status.taskId")
             temp_runs, task_status.status.runs = (
                 task_status.status.runs,
@@ -123,10 +139,7 @@ def process(source_key, source, destination, resources, please_stop=None):
 
             # get the artifact list for the taskId
             try:
-                artifacts = normalized.task.artifacts = http.get_json(
-                    strings.expand_template(TC_ARTIFACTS_URL, {"task_id": task_id}),
-                    retry=TC_RETRY,
-                ).artifacts
+                artifacts = normalized.task.artifacts = _use(fetched, "artifacts").artifacts
             except Exception as e:
                 Log.error(
                     TRY_AGAIN_LATER,
@@ -141,7 +154,7 @@ def process(source_key, source, destination, resources, please_stop=None):
                 a.expires = Date(a.expires)
                 if a.name.endswith("/live_backing.log"):
                     try:
-                        read_actions(source_key, normalized, a.url)
+                        read_actions(source_key, normalized, a.url, fetched.get("logs", {}).get(a.url))
                     except Exception as e:
                         if normalized.task.run.status != "completed":
                             # THIS IS EXPECTED WHEN THE TASK IS IN AN ERROR STATE, CHECK IT AND IGNORE
@@ -187,22 +200,16 @@ def process(source_key, source, destination, resources, please_stop=None):
                 "machine": machine_metadata,
             }
 
-            tc_message.artifact = "." if tc_message.artifact else Null
-            if normalized.task.id in seen_tasks:
-                try:
-                    assertAlmostEqual(
-                        [tc_message, task, artifacts],
-                        seen_tasks[normalized.task.id],
-                        places=11,
-                    )
-                except Exception as e:
-                    Log.error("Not expected", cause=e)
-            else:
-                tc_message._meta = Null
-                tc_message.runs = Null
-                tc_message.runId = Null
-                tc_message.artifact = Null
-                seen_tasks[normalized.task.id] = [tc_message, task, artifacts]
+            # THESE PROPERTIES ARE EXPECTED TO CHANGE BETWEEN MESSAGES FOR THE SAME TASK
+            tc_message._meta = Null
+            tc_message.runs = Null
+            tc_message.runId = Null
+            tc_message.artifact = Null
+            expected = seen_tasks.get(normalized.task.id)
+            if expected is None:
+                seen_tasks.set(normalized.task.id, _fingerprint([tc_message, task, artifacts]))
+            elif not _matches(expected, [tc_message, task, artifacts]):
+                Log.error("Not expected: task {{task}} changed since last seen", task=normalized.task.id)
 
             output.append(normalized)
         except Exception as e:
@@ -221,15 +228,23 @@ def process(source_key, source, destination, resources, please_stop=None):
                     cause=e,
                 )
 
+    set_repos(source_key, output, resources)
+    DEBUG and Log.note("seen_tasks {{stats|json}}", stats=seen_tasks.stats)
     keys = destination.extend({"id": etl2key(t.etl), "value": t} for t in output)
     return keys
 
 
-def read_actions(source_key, normalized, url):
+def read_actions(source_key, normalized, url, all_log_lines=None):
+    """
+    :param all_log_lines: THE LOG LINES, IF ALREADY FETCHED (OR THE Except FROM FETCHING THEM)
+    """
     if DISABLE_LOG_PARSING:
         return
     try:
-        all_log_lines = http.get(url).get_all_lines(encoding=Null)
+        if all_log_lines is None:
+            all_log_lines = _get_log_lines(url)
+        elif isinstance(all_log_lines, Except):
+            raise all_log_lines
         normalized.action = process_tc_live_backing_log(
             source_key, all_log_lines, url, normalized
         )
@@ -249,6 +264,181 @@ def read_actions(source_key, normalized, url):
             Log.error("problem processing {{key}}", key=source_key, cause=e)
 
 
+def _fingerprint(value):
+    """
+    :return: (paths, digest) PAIR; THE PATHS TO THE NON-NULL LEAVES OF value, AND
+             A DIGEST OF THE VALUES AT THOSE PATHS, SO value NEED NOT BE KEPT
+    """
+    leaves = []
+    _leaves(value, (), leaves)
+    paths = tuple(p for p, _ in leaves)
+    if len(_shapes) >= SHAPES_SIZE:
+        _shapes.clear()
+    paths = _shapes.setdefault(paths, paths)
+    return paths, _digest([v for _, v in leaves])
+
+
+def _matches(fingerprint, value):
+    """
+    :return: True IF value HAS THE SAME LEAVES AS THE fingerprint; LIKE
+             assertAlmostEqual(value, expected), PROPERTIES ADDED SINCE ARE IGNORED
+    """
+    paths, digest = fingerprint
+    return _digest([_get_path(value, p) for p in paths]) == digest
+
+
+def _leaves(value, path, output):
+    value = unwrap(value)
+    if isinstance(value, dict):
+        for k, v in sorted(value.items()):
+            _leaves(v, path + (k,), output)
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            _leaves(v, path + (i,), output)
+    elif value is not None:
+        output.append((path, value))
+
+
+def _get_path(value, path):
+    for step in path:
+        value = unwrap(value)
+        if isinstance(value, dict):
+            value = value.get(step)
+        elif isinstance(value, list) and isinstance(step, int) and step < len(value):
+            value = value[step]
+        else:
+            return None
+    return unwrap(value)
+
+
+def _digest(values):
+    return hashlib.sha1(value2json(values).encode("utf8")).digest()
+
+
+def _get_log_lines(url, session=None):
+    """
+    :return: GENERATOR OF (undecoded) LINES, READ FROM THE RESPONSE STREAM AS THEY ARE CONSUMED
+    """
+    return http.get(url, session=session).get_all_lines(encoding=Null)
+
+
+class TaskFetcher(object):
+    """
+    FETCH THE TASKCLUSTER RESOURCES FOR THE NEXT READ_AHEAD LINES, USING
+    MAX_THREADS THREADS, WHILE THE CALLER PROCESSES THE LINES IN ORDER
+    """
+
+    def __init__(self, source_key, lines):
+        self.lines = lines
+        self.fetched = [None] * len(lines)  # (ready, result) FOR EACH LINE
+        self.num_queued = 0
+        self.todo = Queue("fetch tasks for " + source_key, silent=True)
+        self.please_stop = Signal("stop fetching tasks for " + source_key)
+        self.workers = [
+            Thread.run(
+                "fetch tasks " + text(i), self._worker, please_stop=self.please_stop
+            )
+            for i in range(MAX_THREADS)
+        ]
+
+    def get(self, line_number):
+        """
+        :return: dict OF FETCHED RESOURCES FOR THE GIVEN LINE (BLOCKS UNTIL READY)
+        """
+        while self.num_queued < min(line_number + 1 + READ_AHEAD, len(self.lines)):
+            ready, result = self.fetched[self.num_queued] = (
+                Signal("fetched line " + text(self.num_queued)),
+                {},
+            )
+            self.todo.add((self.lines[self.num_queued], ready, result))
+            self.num_queued += 1
+
+        ready, result = self.fetched[line_number]
+        self.fetched[line_number] = None  # RELEASE MEMORY AS WE GO
+        ready.wait()
+        return result
+
+    def _worker(self, please_stop):
+        session = requests.session()
+        try:
+            while not please_stop:
+                todo = self.todo.pop(till=please_stop)
+                if todo is None or todo is THREAD_STOP:
+                    break
+                line, ready, result = todo
+                try:
+                    _fetch_task(line, result, session)
+                finally:
+                    ready.go()
+        finally:
+            session.close()
+
+    def close(self):
+        self.please_stop.go()
+        self.todo.add(THREAD_STOP)
+        for w in self.workers:
+            w.join()
+
+
+def _fetch_task(line, output, session):
+    """
+    FILL output WITH THE NETWORK RESOURCES REQUIRED TO PROCESS line
+    EXCEPTIONS ARE KEPT, TO BE RAISED WHEN THE RESOURCE IS USED
+    """
+
+    def fetch(output, name, get):
+        try:
+            output[name] = get()
+            return output[name]
+        except Exception as e:
+            output[name] = Except.wrap(e)
+            return None
+
+    try:
+        task_id = json2value(line).status.taskId
+    except Exception:
+        # THE CALLER WILL COMPLAIN ABOUT THIS LINE
+        return
+
+    task = fetch(output, "task", lambda: http.get_json(
+        strings.expand_template(TC_MAIN_URL, {"task_id": task_id}),
+        retry=TC_RETRY,
+        session=session,
+    ))
+    if task is None or task.code == "ResourceNotFound":
+        return
+    fetch(output, "status", lambda: http.get_json(
+        strings.expand_template(TC_STATUS_URL, {"task_id": task_id}),
+        retry=TC_RETRY,
+        session=session,
+    ))
+    artifacts = fetch(output, "artifacts", lambda: http.get_json(
+        strings.expand_template(TC_ARTIFACTS_URL, {"task_id": task_id}),
+        retry=TC_RETRY,
+        session=session,
+    ))
+    if artifacts is None or DISABLE_LOG_PARSING:
+        return
+
+    logs = output["logs"] = {}
+    for a in artifacts.artifacts:
+        if a.name.endswith("/live_backing.log"):
+            url = strings.expand_template(
+                TC_ARTIFACT_URL, {"task_id": task_id, "path": a.name}
+            )
+            fetch(logs, url, lambda: _get_log_lines(url, session))
+
+
+def _use(fetched, name):
+    """
+    RETURN THE FETCHED RESOURCE, OR RAISE THE PROBLEM ENCOUNTERED FETCHING IT
+    """
+    value = fetched.get(name)
+    if isinstance(value, Except):
+        raise value
+    return value
+
+
 def _normalize(source_key, task_id, tc_message, task, resources):
     output = Data()
     set_default(task, consume(tc_message, "status"))
@@ -546,6 +736,72 @@ def _normalize_run(source_key, normalized, task, env):
     )
 
 
+def set_repos(source_key, output, resources):
+    """
+    ASSIGN repo (AND build.date) TO ALL normalized TASKS, WITH ONE BATCH
+    REVISION LOOKUP FOR THE WHOLE BLOCK
+    """
+    todo = [n for n in output if n.build.revision]
+    candidates = [
+        wrap({
+            "branch": {"name": n.build.branch},
+            "changeset": {"id": n.build.revision},
+        })
+        for n in todo
+    ]
+    try:
+        repos = resources.hg.get_revisions(candidates)
+    except Exception as e:
+        _raise_if_try_again(Except.wrap(e))
+        # ONE BAD REVISION SHOULD NOT SPOIL THE REST
+        repos = []
+        for normalized, candidate in zip(todo, candidates):
+            try:
+                repos.append(resources.hg.get_minimal_revision(candidate))
+            except Exception as f:
+                f = Except.wrap(f)
+                _raise_if_try_again(f)
+                # AS BEFORE THE BATCH LOOKUP, THE TASK IS NOT PROCESSED
+                Log.warning(
+                    "TaskCluster task {{task}} not processed for key {{key}}: can not get revision {{rev}}",
+                    task=normalized.task.id,
+                    key=source_key,
+                    rev=candidate,
+                    cause=f
+                )
+                output.remove(normalized)
+                repos.append(None)
+
+    for normalized, candidate, repo in zip(todo, candidates, repos):
+        if repo is None:
+            continue
+        normalized.repo = repo
+        if not normalized.repo:
+            if normalized.build.branch not in UNKNOWN_BRANCHES:
+                Log.warning(
+                    "No repo found for {{rev}} while processing key={{key}}",
+                    key=source_key,
+                    rev=candidate,
+                )
+            normalized.repo = candidate
+            normalized.repo.changeset.id12 = normalized.build.revision[:12]
+        elif not normalized.repo.push.date:
+            Log.warning(
+                "did not assign a repo.push.date for source_key={{key}}", key=source_key
+            )
+        normalized.build.date = normalized.repo.push.date
+
+
+def _raise_if_try_again(e):
+    """
+    RAISE TRY_AGAIN_LATER IF e IS TEMPORARY, LIKE _process() DOES
+    """
+    if TRY_AGAIN_LATER in e:
+        raise e
+    elif mo_math.round(e.params.code, decimal=-2) == 500:
+        Log.error(TRY_AGAIN_LATER, reason="error code " + text(e.params.code))
+
+
 def set_build_info(source_key, normalized, task, env, resources):
     """
     Get a build object that describes the build
@@ -654,26 +910,7 @@ def set_build_info(source_key, normalized, task, env, resources):
     )
     normalized.build.revision12 = normalized.build.revision[0:12]
 
-    if normalized.build.revision:
-        candidate = {
-            "branch": {"name": normalized.build.branch},
-            "changeset": {"id": normalized.build.revision},
-        }
-        normalized.repo = minimize_repo(resources.hg.get_revision(wrap(candidate)))
-        if not normalized.repo:
-            if normalized.build.branch not in UNKNOWN_BRANCHES:
-                Log.warning(
-                    "No repo found for {{rev}} while processing key={{key}}",
-                    key=source_key,
-                    rev=candidate,
-                )
-            normalized.repo = candidate
-            normalized.repo.changeset.id12 = normalized.build.revision[:12]
-        elif not normalized.repo.push.date:
-            Log.warning(
-                "did not assign a repo.push.date for source_key={{key}}", key=source_key
-            )
-        normalized.build.date = normalized.repo.push.date
+    # normalized.repo IS SET BY set_repos(), FOR THE WHOLE BLOCK AT ONCE
 
     normalized.run.phabricator_diff = consume(
         task, "extra.code-review.phabricator-diff"
@@ -14,7 +14,6 @@ import mo_math
 from activedata_etl import etl2key, key2etl
 from activedata_etl.transforms import TRY_AGAIN_LATER
 from mo_dots import Data, listwrap, wrap, set_default, is_data
-from mo_hg.hg_mozilla_org import minimize_repo
 from mo_json import json2value
 from mo_logs import Log, machine_metadata, strings, Except
 from mo_times.dates import Date
@@ -188,9 +187,7 @@ def normalize(source_key, resources, raw_treeherder, new_treeherder):
     }
     try:
         if new_treeherder.build.branch not in NON_HG_BRANCHES:
-            new_treeherder.repo = minimize_repo(
-                resources.hg.get_revision(new_treeherder.repo)
-            )
+            new_treeherder.repo = resources.hg.get_minimal_revision(new_treeherder.repo)
     except Exception as e:
         Log.warning(
             "Problem with getting info changeset {{changeset}}",
@@ -8,15 +8,16 @@
 #
 from __future__ import division, unicode_literals
 
+from activedata_etl.sinks.s3_bucket import S3Bucket
 from activedata_etl.transforms import TRY_AGAIN_LATER
 from activedata_etl.transforms.pulse_block_to_es import transform_buildbot
 from jx_python import jx
 from mo_dots import Data, Null, coalesce, set_default, wrap
 from mo_future import text, is_text
-from mo_json import json2value, scrub
+from mo_json import Envelope, json2value, scrub
+from mo_json.decoder import json_decoder
 from mo_logs import Log, machine_metadata, strings
 from mo_logs.exceptions import Except
-from mo_math import MAX, MIN
 from mo_times.dates import Date
 from mo_times.durations import DAY
 from mo_times.timer import Timer
@@ -25,6 +26,7 @@ from mo_times.dates import parse
 
 DEBUG = True
 ACCESS_DENIED = "Access Denied to {{url}} in {{key}}"
+KEEP_LOGS = False  # True TO RETAIN EVERY STRUCTURED LOG LINE, PER TEST, IN LogSummary.logs (FOR DEBUGGING, USES A LOT OF MEMORY)
 
 
 def last(l):
@@ -114,50 +116,81 @@ def process_unittest(source_key, etl_header, buildbot_summary, unittest_log, des
 
             new_data.append({
                 "id": key,
-                "value": set_default(
-                    {
-                        "result": t,
-                        "etl": {"id": i}
-                    },
-                    buildbot_summary
-                )
+                "value": {
+                    "result": t,
+                    "etl": {"id": i}
+                }
             })
+
+        if isinstance(destination, S3Bucket):
+            # SERIALIZE THE buildbot_summary ONCE, NOT ONCE PER TEST
+            destination.extend(new_data, envelope=Envelope(buildbot_summary))
+            return new_keys
+
+        for d in new_data:
+            d["value"] = set_default(d["value"], buildbot_summary)
     destination.extend(new_data)
     return new_keys
 
 
 def accumulate_logs(source_key, url, lines, suite_name, please_stop):
     accumulator = LogSummary(source_key, url)
+    stats = accumulator.stats
+    # DISPATCH TABLE, SO WE DO NOT LOOKUP THE HANDLER BY NAME FOR EVERY LINE
+    handlers = {
+        "suite_start": accumulator.suite_start,
+        "test_start": accumulator.test_start,
+        "test_status": accumulator.test_status,
+        "process_output": accumulator.process_output,
+        "log": accumulator.log,
+        "crash": accumulator.crash,
+        "test_end": accumulator.test_end,
+        "suite_end": accumulator.suite_end,
+    }
+    action_counts = {}
+    num_bytes = 0
+    num_lines = 0
+    bad_lines = 0
+    start_time = None
+    end_time = None
     last_line_was_json = True
     for line_num, line in enumerate(lines):
         if please_stop:
             Log.error("Shutdown detected.  Structured log iterator is stopped.")
-        accumulator.stats.bytes += len(line) + 1  # INCLUDE THE \n THAT WOULD HAVE BEEN AT END OF EACH LINE
+        num_bytes += len(line) + 1  # INCLUDE THE \n THAT WOULD HAVE BEEN AT END OF EACH LINE
         line = strings.strip(line)
 
         if line == "":
             continue
         try:
-            accumulator.stats.lines += 1
+            num_lines += 1
             last_line_was_json = False
-            log = json2value(line)
+            raw = json_decoder(line)  # PLAIN dict, ONLY WRAPPED IF A HANDLER NEEDS IT
             last_line_was_json = True
-            log.time = parse(log.time)
-            accumulator.stats.start_time = MIN([accumulator.stats.start_time, log.time])
-            accumulator.stats.end_time = MAX([accumulator.stats.end_time, log.time])
+            time = raw["time"] = parse(raw.get("time"))
+            if start_time is None or time < start_time:
+                start_time = time
+            if end_time is None or time > end_time:
+                end_time = time
 
             # FIX log.test TO BE A STRING
-            if isinstance(log.test, list):
-                log.test = " ".join(log.test)
-
-            accumulator.stats.action[log.action] += 1
-            try:
-                accumulator.__getattribute__(log.action)(log)
-            except AttributeError:
-                pass
+            test = raw.get("test")
+            if isinstance(test, list):
+                test = raw["test"] = " ".join(test)
+
+            action = raw.get("action")
+            action_counts[action] = action_counts.get(action, 0) + 1
+            handler = handlers.get(action)
+            if action == "log" and not test:
+                pass  # MOST LINES ARE GENERAL LOGGING, WHICH LogSummary IGNORES
+            elif handler:
+                try:
+                    handler(wrap(raw))
+                except AttributeError:
+                    pass
 
-            if log.subtest:
-                accumulator.end_time = log.time
+            if raw.get("subtest"):
+                accumulator.end_time = time
         except Exception as e:
             e = Except.wrap(e)
             if line.startswith('<!DOCTYPE html>') or line.startswith('<?xml version="1.0"'):
@@ -170,17 +203,26 @@ def accumulate_logs(source_key, url, lines, suite_name, please_stop):
             Log.warning(
                 "bad line #{{line_number}} in key={{key}} url={{url|quote}}:\n{{line|quote}}",
                 key=source_key,
-                line_number=accumulator.stats.lines,
+                line_number=num_lines,
                 line=prefix,
                 url=url,
                 cause=e
             )
-            accumulator.stats.bad_lines += 1
+            bad_lines += 1
 
     if not last_line_was_json:
         # HAPPENS WHEN FILE IS DOWNLOADED TOO SOON, AND IS INCOMPLETE
         Log.error(TRY_AGAIN_LATER, reason="Incomplete file")
 
+    stats.bytes = num_bytes
+    stats.lines = num_lines
+    if bad_lines:
+        stats.bad_lines = bad_lines
+    stats.start_time = start_time
+    stats.end_time = end_time
+    for action, count in action_counts.items():
+        stats.action[action] = count
+
     output = accumulator.summary()
     Log.note(
         "{{num_bytes|comma}} bytes, {{num_lines|comma}} lines and {{num_tests|comma}} tests in {{url|quote}} for key {{key}}",
@@ -195,9 +237,15 @@ def accumulate_logs(source_key, url, lines, suite_name, please_stop):
 
 
 class LogSummary(object):
-    def __init__(self, source_key, url):
+    """
+    CONSTANT-SIZE AGGREGATES PER TEST (PLUS FAILING SUBTESTS); THE RAW LOG
+    LINES ARE ONLY KEPT IN self.logs IF keep_logs (FOR DEBUGGING)
+    """
+
+    def __init__(self, source_key, url, keep_logs=None):
         self.source_key = source_key
         self.url = url
+        self.keep_logs = coalesce(keep_logs, KEEP_LOGS)
         self.suite_name = None
         self.start_time = None
         self.end_time = None
@@ -276,7 +324,7 @@ class LogSummary(object):
             Log.warning("Log has blank 'test' property! Do not know how to handle. In {{key}} ", key=self.source_key)
             return
 
-        self.logs.setdefault(log.test, []).append(log)
+        self._keep(log)
         test = self._get_test(log)
         test.stats.action.test_status += 1
         test.end_time = log.time
@@ -309,14 +357,14 @@ class LogSummary(object):
 
     def process_output(self, log):
         if log.test:
-            self.logs.setdefault(log.test, []).append(log)
+            self._keep(log)
         pass
 
     def log(self, log):
         if not log.test:
             return
 
-        self.logs.setdefault(log.test, []).append(log)
+        self._keep(log)
         test = self._get_test(log)
         test.stats.action.log += 1
         test.end_time = log.time
@@ -326,7 +374,7 @@ class LogSummary(object):
         if not log.test:
             log.test = "!!SUITE CRASH!!"
 
-        self.logs.setdefault(log.test, []).append(log)
+        self._keep(log)
 
         test = self._get_test(log)
         test.ok = False
@@ -341,7 +389,7 @@ class LogSummary(object):
         # test.crash_result.action = None
 
     def test_end(self, log):
-        self.logs.setdefault(log.test, []).append(log)
+        self._keep(log)
         test = self._get_test(log)
         test.ok = True if log.expected == None or log.expected == log.status else False
         if not all(test.subtests.ok):
@@ -352,6 +400,10 @@ class LogSummary(object):
         test.duration = coalesce(test.end_time - test.start_time, log.extra.runtime)
         test.extra = test.extra
 
+    def _keep(self, log):
+        if self.keep_logs:
+            self.logs.setdefault(log.test, []).append(log)
+
     def _get_test(self, log):
         test = last(self.tests.get(log.test))
         if not test:
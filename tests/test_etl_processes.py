@@ -0,0 +1,57 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Contact: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import division
+from __future__ import unicode_literals
+
+from activedata_etl.etl import _check_processes
+from mo_dots import wrap
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+WORKERS = [
+    {"name": "tc_pulse to TC Normalized", "source": {"bucket": "active-data-task-cluster-logger"}},
+    {"name": "taskcluster to test_result", "source": {"bucket": "active-data-task-cluster-normalized"}},
+    {"name": "codecoverage", "source": {"bucket": "active-data-task-cluster-normalized"}}
+]
+
+
+class TestEtlProcesses(FuzzyTestCase):
+
+    def test_bucket_in_one_group(self):
+        _check_processes(_settings([
+            {"name": "tc", "workers": ["tc_pulse to TC Normalized"]},
+            {"name": "logs", "workers": ["taskcluster to test_result", "codecoverage"]}
+        ]))
+
+    def test_bucket_split_across_groups(self):
+        self.assertRaises("Put them in the same process", _check_processes, _settings([
+            {"name": "tc", "workers": ["tc_pulse to TC Normalized"]},
+            {"name": "results", "workers": ["taskcluster to test_result"]},
+            {"name": "coverage", "workers": ["codecoverage"]}
+        ]))
+
+    def test_group_with_all_workers(self):
+        self.assertRaises("Put them in the same process", _check_processes, _settings([
+            {"name": "all"},
+            {"name": "coverage", "workers": ["codecoverage"]}
+        ]))
+
+    def test_split_with_own_queue(self):
+        _check_processes(_settings([
+            {"name": "tc", "workers": ["tc_pulse to TC Normalized"]},
+            {"name": "results", "workers": ["taskcluster to test_result"]},
+            {"name": "coverage", "workers": ["codecoverage"], "work_queue": {"name": "active-data-codecoverage"}}
+        ]))
+
+
+def _settings(processes):
+    return wrap({
+        "work_queue": {"name": "active-data-etl"},
+        "workers": WORKERS,
+        "param": {"processes": processes}
+    })
@@ -0,0 +1,112 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Contact: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import division
+from __future__ import unicode_literals
+
+from mo_collections.lru import LRU
+from mo_dots import wrap
+from mo_hg.hg_mozilla_org import HgMozillaOrg
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_threads import Lock
+
+PUSH_DATE = 1500000000
+
+
+class TestHgMozillaOrg(FuzzyTestCase):
+
+    def test_get_revisions_in_order(self):
+        hg = _hg(docs=[_doc("try", "en-US", "aaaaaaaaaaaa")])
+        result = hg.get_revisions([
+            _revision("try", "bbbbbbbbbbbbbbbb"),
+            _revision("try", "aaaaaaaaaaaaaaaa"),
+            _revision(None, "cccccccccccccccc"),
+            _revision("try", "bbbbbbbbbbbb0000"),  # SAME id12 AS THE FIRST
+            _revision("try", "aaaaaaaaaaaaaaaa"),
+        ])
+
+        self.assertEqual([r.changeset.id12 for r in result], ["bbbbbbbbbbbb", "aaaaaaaaaaaa", None, "bbbbbbbbbbbb", "aaaaaaaaaaaa"])
+        # ONE ES QUERY, AND ONE hg CALL FOR THE ONE MISSING FROM ES
+        self.assertEqual(len(hg.repo.queries), 1)
+        self.assertEqual(hg.asked, [("bbbbbbbbbbbbbbbb", "en-US")])
+
+        # ALL FROM MEMORY THE SECOND TIME
+        result = hg.get_revisions([_revision("try", "aaaaaaaaaaaaaaaa"), _revision("try", "bbbbbbbbbbbbbbbb")])
+        self.assertEqual([r.changeset.id12 for r in result], ["aaaaaaaaaaaa", "bbbbbbbbbbbb"])
+        self.assertEqual(len(hg.repo.queries), 1)
+        self.assertEqual(len(hg.asked), 1)
+
+    def test_es_locale(self):
+        hg = _hg(docs=[
+            _doc("try", "en-US", "aaaaaaaaaaaa", _id="try.aaaaaaaaaaaa.old"),
+            _doc("try", "en-US", "aaaaaaaaaaaa", _id="try.aaaaaaaaaaaa.en-US", description="chosen"),
+            _doc("try", "en-US", "aaaaaaaaaaaa", _id="try.aaaaaaaaaaaa.older"),
+            _doc("try", "fr", "aaaaaaaaaaaa"),  # NOT ASKED FOR
+            _doc("try", "en-US", "bbbbbbbbbbbb", push_date=None),  # NOT COMPLETE
+        ])
+        result = hg._get_many_from_elasticsearch([("try", "en-US", "aaaaaaaaaaaa"), ("try", "en-US", "bbbbbbbbbbbb")])
+
+        self.assertEqual(list(result.keys()), [("try", "en-US", "aaaaaaaaaaaa")])
+        self.assertEqual(result[("try", "en-US", "aaaaaaaaaaaa")].changeset.description, "chosen")
+
+    def test_es_failure_falls_back_to_hg(self):
+        hg = _hg(docs=Exception("ES is down"))
+        result = hg.get_revisions([_revision("try", "aaaaaaaaaaaaaaaa"), _revision("try", "bbbbbbbbbbbbbbbb")])
+
+        self.assertEqual([r.changeset.id12 for r in result], ["aaaaaaaaaaaa", "bbbbbbbbbbbb"])
+        self.assertEqual(sorted(hg.asked), [("aaaaaaaaaaaaaaaa", "en-US"), ("bbbbbbbbbbbbbbbb", "en-US")])
+
+
+def _revision(branch, id):
+    return wrap({"branch": {"name": branch}, "changeset": {"id": id}})
+
+
+def _doc(branch, locale, id12, _id=None, push_date=PUSH_DATE, description=None):
+    return {
+        "_id": _id or branch + "." + id12 + "." + locale,
+        "_source": {
+            "branch": {"name": branch, "locale": locale},
+            "changeset": {"id": id12 + "0000", "id12": id12, "description": description},
+            "push": {"date": push_date},
+        }
+    }
+
+
+def _hg(docs):
+    """
+    HgMozillaOrg WITH STUBBED ES (repo.search) AND HG (get_revision)
+    """
+    output = object.__new__(HgMozillaOrg)
+    output.repo = _Repo(docs)
+    output.repo_locker = Lock()
+    output.local_cache = None
+    output.minimal_revisions = LRU(max_size=100)
+    output.asked = []
+
+    def get_revision(revision, locale=None):
+        output.asked.append((revision.changeset.id, locale))
+        return wrap({
+            "branch": {"name": revision.branch.name, "locale": locale},
+            "changeset": {"id": revision.changeset.id, "id12": revision.changeset.id[:12]},
+            "push": {"date": PUSH_DATE},
+        })
+
+    output.get_revision = get_revision
+    return output
+
+
+class _Repo(object):
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def search(self, query):
+        self.queries.append(query)
+        if isinstance(self.docs, Exception):
+            raise self.docs
+        return wrap({"hits": {"hits": self.docs}})
@@ -0,0 +1,103 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Contact: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import division
+from __future__ import unicode_literals
+
+from mo_http import http
+from mo_http.http import CIRCUIT_COOLDOWN, CIRCUIT_THRESHOLD, Circuit
+from mo_logs import Log
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+URL = "http://circuit.test:9200/_bulk"
+
+
+class TestHttpCircuit(FuzzyTestCase):
+
+    def setUp(self):
+        self.session_request = http._session_request
+        http._circuits.clear()
+
+    def tearDown(self):
+        http._session_request = self.session_request
+        http._circuits.clear()
+
+    def test_open_probe_close(self):
+        circuit = Circuit("test")
+        for _ in range(CIRCUIT_THRESHOLD - 1):
+            circuit.failure()
+        circuit.check()  # STILL CLOSED
+
+        circuit.failure()
+        self.assertRaises("too many failures", circuit.check)
+
+        # AFTER THE COOLDOWN, ONE PROBE IS LET THROUGH
+        circuit.open_until = 0
+        circuit.check()
+        self.assertRaises("waiting on probe", circuit.check)
+
+        # PROBE FAILS, COOLDOWN DOUBLES
+        circuit.failure()
+        self.assertEqual(circuit.cooldown, 2 * CIRCUIT_COOLDOWN)
+        self.assertRaises("too many failures", circuit.check)
+
+        # NEXT PROBE WORKS, CIRCUIT CLOSES
+        circuit.open_until = 0
+        circuit.check()
+        circuit.success()
+        circuit.check()
+        circuit.check()
+        self.assertEqual(circuit.failures, 0)
+        self.assertEqual(circuit.cooldown, CIRCUIT_COOLDOWN)
+
+    def test_rejections_do_not_open(self):
+        _respond(429, 500, 502)
+        for _ in range(3 * CIRCUIT_THRESHOLD):
+            http.request("post", URL, session=_Session())
+        self.assertEqual(http.get_circuit(URL).failures, 0)
+
+    def test_unavailable_opens(self):
+        _respond(503)
+        for _ in range(CIRCUIT_THRESHOLD):
+            self.assertEqual(http.request("post", URL, session=_Session()).status_code, 503)
+        self.assertRaises(http.CIRCUIT_OPEN, http.request, "post", URL, session=_Session())
+
+    def test_no_response_opens(self):
+        def fail(*args, **kwargs):
+            Log.error("Connection refused")
+        http._session_request = fail
+
+        for _ in range(CIRCUIT_THRESHOLD):
+            self.assertRaises("Connection refused", http.request, "post", URL, session=_Session())
+        self.assertRaises(http.CIRCUIT_OPEN, http.request, "post", URL, session=_Session())
+
+
+def _respond(*codes):
+    """
+    REPLACE THE NETWORK WITH RESPONSES THAT CYCLE THROUGH codes
+    """
+    state = {"n": 0}
+
+    def session_request(*args, **kwargs):
+        code = codes[state["n"] % len(codes)]
+        state["n"] += 1
+        return _Response(code)
+    http._session_request = session_request
+
+
+class _Session(object):
+    headers = {}
+
+
+class _Response(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+    def close(self):
+        pass
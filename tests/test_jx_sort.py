@@ -0,0 +1,85 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Contact: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import division
+from __future__ import unicode_literals
+
+from jx_base import query
+from jx_base.language import value_compare
+from jx_python import jx
+from jx_python.expressions import jx_expression_to_function as get
+from mo_dots import unwrap
+from mo_future import sort_using_cmp
+from mo_logs import Log
+from mo_math.randoms import Random
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_times import Date
+from mo_times.timer import Timer
+
+MIXED = [None, float("nan"), True, False, 0, 1, 2.5, -3, "a", "b", "ab", Date("2019-01-01"), (1, 2), (0, 5)]
+
+
+class TestJxSort(FuzzyTestCase):
+
+    def test_nulls_last(self):
+        self.assertEqual(jx.sort([3, None, 1, 2]), [1, 2, 3, None])
+        self.assertEqual(jx.sort([{"a": 3}, {}, {"a": 1}], {"a": "desc"}), [{"a": 3}, {"a": 1}, {}])
+
+    def test_mixed_types(self):
+        for _ in range(100):
+            values = [Random.sample(MIXED, 1)[0] for _ in range(30)]
+            self.assertEqual(_ids(jx.sort(values)), _ids(sort_using_cmp(values, value_compare)))
+
+    def test_many_fields(self):
+        rows = [
+            {"a": Random.sample(MIXED, 1)[0], "b": Random.range(0, 3), "c": [Random.range(0, 2) for _ in range(Random.range(0, 3))]}
+            for _ in range(300)
+        ]
+        for sort in [
+            ["a"],
+            [{"a": "desc"}],
+            ["b", {"a": "desc"}],
+            [{"b": "desc"}, "c"],
+            ["b", {"c": "desc"}],
+        ]:
+            self.assertEqual(_ids(jx.sort(rows, sort)), _ids(_cmp_sort(rows, sort)))
+
+    def test_speed(self):
+        rows = [
+            {"build": {"date": Random.range(0, 10000)}, "name": Random.sample(["a", "b", "c", None], 1)[0]}
+            for _ in range(10000)
+        ]
+        sort = ["name", {"build.date": "desc"}]
+        with Timer("sort by key") as key_time:
+            result = jx.sort(rows, sort)
+        with Timer("sort by value_compare") as cmp_time:
+            expected = _cmp_sort(rows, sort)
+
+        self.assertEqual(_ids(result), _ids(expected))
+        # TIMING IS ONLY REPORTED; A BUSY MACHINE MAKES IT TOO NOISY TO ASSERT
+        Log.note("{{num}}x faster", num=round(cmp_time.duration.seconds / max(key_time.duration.seconds, 0.001), 1))
+
+
+def _cmp_sort(rows, sort):
+    """
+    THE ORIGINAL jx.sort(), ONE value_compare() FOR EVERY COMPARISON
+    """
+    funcs = [(get(f.value), f.sort) for f in query._normalize_sort(sort)]
+
+    def comparer(left, right):
+        for func, sort_ in funcs:
+            result = value_compare(func(left), func(right), sort_)
+            if result != 0:
+                return result
+        return 0
+
+    return sort_using_cmp(rows, cmp=comparer)
+
+
+def _ids(values):
+    return [id(v) for v in unwrap(values)]
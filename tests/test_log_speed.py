@@ -0,0 +1,76 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Contact: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import division
+from __future__ import unicode_literals
+
+from mo_logs import Log, strings
+from mo_logs.log_usingNothing import StructuredLogger
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_times.timer import Timer
+
+TEMPLATE = "{{id}} found (line #{{num}}) in {{name|quote}} at {{time|datetime}}"
+PARAMS = {"id": 42, "num": 7, "name": "test_speed", "time": 1500000000}
+N = 5000
+
+
+class TestLogSpeed(FuzzyTestCase):
+
+    def setUp(self):
+        self.main_log = Log.main_log
+
+    def tearDown(self):
+        Log.main_log = self.main_log
+
+    def test_expand_template(self):
+        self.assertEqual(
+            strings.expand_template(TEMPLATE, PARAMS),
+            "42 found (line #7) in \"test_speed\" at 2017-07-14 02:40:00"
+        )
+
+        with Timer("compile every time") as uncached:
+            for _ in range(N):
+                strings._templates.clear()
+                strings.expand_template(TEMPLATE, PARAMS)
+        with Timer("compile once") as cached:
+            for _ in range(N):
+                strings.expand_template(TEMPLATE, PARAMS)
+
+        # TIMING IS ONLY REPORTED; A BUSY MACHINE MAKES IT TOO NOISY TO ASSERT
+        Log.note("{{num}}x faster", num=round(uncached.duration.seconds / max(cached.duration.seconds, 0.001), 1))
+
+    def test_note_throughput(self):
+        lines = []
+        Log.main_log = _Rendering(lines)
+        with Timer("render every note") as rendered:
+            for i in range(N):
+                Log.note(TEMPLATE, id=i, num=7, name="test_speed", time=1500000000)
+        self.assertEqual(len([l for l in lines if "test_speed" in l]), N)
+
+        Log.main_log = Log.new_instance({"log_type": "nothing"})
+        with Timer("discard every note") as discarded:
+            for i in range(N):
+                Log.note(TEMPLATE, id=i, num=7, name="test_speed", time=1500000000)
+
+        Log.main_log = self.main_log
+        Log.note(
+            "{{num|comma}} notes per second, {{skipped|comma}} when discarded",
+            num=int(N / max(rendered.duration.seconds, 0.001)),
+            skipped=int(N / max(discarded.duration.seconds, 0.001))
+        )
+
+
+class _Rendering(StructuredLogger):
+    """
+    EXPAND EVERY LINE, LIKE A REAL LOGGER, BUT KEEP IT IN MEMORY
+    """
+    def __init__(self, lines):
+        self.lines = lines
+
+    def write(self, template, params):
+        self.lines.append(strings.expand_template(template, params))
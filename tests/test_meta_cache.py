@@ -0,0 +1,79 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Contact: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import division
+from __future__ import unicode_literals
+
+from mo_logs import Log
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_threads import Lock, Thread, Till
+from pyLibrary.meta import cache
+
+
+class TestMetaCache(FuzzyTestCase):
+
+    def test_single_flight(self):
+        calls = []
+        locker = Lock()
+
+        @cache(duration=60, lock=True)
+        def slow(key):
+            with locker:
+                calls.append(key)
+            Till(seconds=0.5).wait()
+            return key + "!"
+
+        results = []
+
+        def worker(please_stop):
+            results.append(slow("a"))
+
+        threads = [Thread.run("caller " + str(i), worker) for i in range(5)]
+        for t in threads:
+            t.join()
+
+        self.assertEqual(calls, ["a"])
+        self.assertEqual(results, ["a!"] * 5)
+        self.assertEqual(slow.cache.stats, {"shared": 4, "size": 1})
+
+    def test_error_expires(self):
+        calls = []
+
+        @cache(duration=60, error_duration=0.5)
+        def flaky(key):
+            calls.append(key)
+            if len(calls) == 1:
+                Log.error("first call fails")
+            return key
+
+        self.assertRaises("first call fails", flaky, "a")
+        self.assertRaises("first call fails", flaky, "a")  # THE EXCEPTION IS CACHED
+        self.assertEqual(len(calls), 1)
+
+        Till(seconds=1).wait()
+        self.assertEqual(flaky("a"), "a")
+        self.assertEqual(flaky("a"), "a")
+        self.assertEqual(len(calls), 2)
+
+    def test_max_size(self):
+        calls = []
+
+        @cache(duration=60, max_size=2)
+        def double(v):
+            calls.append(v)
+            return v * 2
+
+        self.assertEqual([double(v) for v in [1, 2, 3]], [2, 4, 6])
+        self.assertEqual(double.cache.stats, {"size": 2, "hits": 0, "misses": 3, "evictions": 1})
+
+        double(3)  # HIT, 2 IS NOW LEAST RECENTLY USED
+        double(1)  # EVICTED BEFORE, MUST BE CALLED AGAIN; EVICTS 2
+        double(3)
+        double(2)
+        self.assertEqual(calls, [1, 2, 3, 1, 2])
+        self.assertEqual(double.cache.stats, {"size": 2, "hits": 2, "misses": 5, "evictions": 3, "shared": 0})
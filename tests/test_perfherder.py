@@ -11,10 +11,11 @@ from __future__ import unicode_literals
 
 from activedata_etl.sinks.s3_bucket import S3Bucket
 from activedata_etl.transforms import pulse_block_to_perfherder_logs, perfherder_logs_to_perf_logs, EtlHeadGenerator
-from activedata_etl.transforms.perfherder_logs_to_perf_logs import stats
+from activedata_etl.transforms.perfherder_logs_to_perf_logs import stats, many_stats
 from activedata_etl.transforms.pulse_block_to_perfherder_logs import extract_perfherder
 from mo_dots import Null, listwrap, Data
 from mo_logs import Log
+from mo_math import stats as mo_stats
 from mo_math.randoms import Random
 from mo_testing.fuzzytestcase import FuzzyTestCase
 from pyLibrary.aws import s3
@@ -110,6 +111,29 @@ class TestBuildbotLogs(FuzzyTestCase):
         self.assertEqual(results.stats.count, 5)
         self.assertEqual(len(listwrap(results.stats.rejects)), 1)
 
+    def test_many_stats(self):
+        series = [
+            [float(Random.range(1, 5)) for _ in range(Random.range(0, 30))] +
+            [Random.float(1000) for _ in range(Random.range(0, 300))]
+            for _ in range(100)
+        ]
+        series[3] = [float("nan"), 1, 2, 3]
+
+        batched = many_stats(Null, [(s, None) for s in series], None)
+        for s, b in zip(series, batched):
+            self.assertEqual(b, stats(Null, s, None, None))
+
+        # WITH, AND WITHOUT, numpy ARE EXACTLY THE SAME
+        series = series[:3] + series[4:]  # summarize() EXPECTS FINITE VALUES
+        expected = mo_stats.summarize(series, percents=[0.1, 0.9])
+        _numpy, mo_stats.numpy = mo_stats.numpy, None
+        try:
+            result = mo_stats.summarize(series, percents=[0.1, 0.9])
+        finally:
+            mo_stats.numpy = _numpy
+        for r, e in zip(result, expected):
+            self.assertTrue(r.moment.S == e.moment.S)
+            self.assertTrue([r.min, r.max, r.median, r.percentiles] == [e.min, e.max, e.median, e.percentiles])
 
     def test_warning(self):
         values=[float("nan"), 42]
@@ -0,0 +1,101 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Contact: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import division
+from __future__ import unicode_literals
+
+from copy import deepcopy
+
+from activedata_etl.transforms import TRY_AGAIN_LATER
+from activedata_etl.transforms.pulse_block_to_task_cluster import _fingerprint, _matches, set_repos
+from mo_dots import Data, Null, wrap
+from mo_logs import Log
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+MESSAGE = {"status": {"state": "completed", "workerType": "t-linux"}, "version": 1}
+TASK = {"id": "abc", "tags": ["a", "b"], "run": {"suite": "mochitest"}}
+ARTIFACTS = [{"name": "public/logs/live.log", "size": 100}]
+
+
+class TestSeenTasks(FuzzyTestCase):
+
+    def test_same_task(self):
+        expected = _fingerprint(wrap([MESSAGE, TASK, ARTIFACTS]))
+        self.assertTrue(_matches(expected, wrap([MESSAGE, TASK, ARTIFACTS])))
+
+    def test_later_message_has_extra_field(self):
+        expected = _fingerprint(wrap([MESSAGE, TASK, ARTIFACTS]))
+        message = wrap(deepcopy(MESSAGE))
+        message.status.reasonResolved = "completed"
+        artifacts = wrap(ARTIFACTS + [{"name": "public/test_info/resource-usage.json"}])
+        self.assertTrue(_matches(expected, wrap([message, TASK, artifacts])))
+
+    def test_changed_field(self):
+        expected = _fingerprint(wrap([MESSAGE, TASK, ARTIFACTS]))
+        task = wrap(deepcopy(TASK))
+        task.run.suite = "reftest"
+        self.assertFalse(_matches(expected, wrap([MESSAGE, task, ARTIFACTS])))
+
+    def test_missing_field(self):
+        expected = _fingerprint(wrap([MESSAGE, TASK, ARTIFACTS]))
+        self.assertFalse(_matches(expected, wrap([MESSAGE, {"id": "abc", "tags": ["a"]}, ARTIFACTS])))
+
+    def test_shapes_are_shared(self):
+        a, _ = _fingerprint(wrap([MESSAGE, TASK, ARTIFACTS]))
+        b, _ = _fingerprint(wrap([MESSAGE, {"id": "xyz", "tags": ["c", "d"], "run": {"suite": "reftest"}}, ARTIFACTS]))
+        self.assertTrue(a is b)
+
+
+class TestSetRepos(FuzzyTestCase):
+
+    def test_batch(self):
+        output = [_task("a", "aaaaaaaaaaaa"), _task("b", None), _task("c", "cccccccccccc")]
+        set_repos("key", output, Data(hg=_Hg()))
+
+        self.assertEqual([t.task.id for t in output], ["a", "b", "c"])
+        self.assertEqual(output[0].repo.push.date, 1500000000)
+        self.assertEqual(output[0].build.date, 1500000000)
+        self.assertEqual(output[1].repo, None)
+        self.assertEqual(output[2].build.date, 1500000000)
+
+    def test_failed_lookup_drops_task(self):
+        output = [_task("a", "aaaaaaaaaaaa"), _task("bad", "badbadbadbad"), _task("unknown", "000000000000")]
+        set_repos("key", output, Data(hg=_Hg(fail={"badbadbadbad": 404})))
+
+        self.assertEqual([t.task.id for t in output], ["a", "unknown"])
+        self.assertEqual(output[0].build.date, 1500000000)
+        # NOT FOUND, BUT NO ERROR, SO THE CANDIDATE IS USED
+        self.assertEqual(output[1].repo.changeset.id12, "000000000000")
+        self.assertEqual(output[1].build.date, None)
+
+    def test_server_error_tries_again_later(self):
+        output = [_task("a", "aaaaaaaaaaaa"), _task("bad", "badbadbadbad")]
+        self.assertRaises(TRY_AGAIN_LATER, set_repos, "key", output, Data(hg=_Hg(fail={"badbadbadbad": 502})))
+
+
+def _task(id, revision):
+    return wrap({"task": {"id": id}, "build": {"branch": "try", "revision": revision}})
+
+
+class _Hg(object):
+    """
+    get_revisions() FAILS IF ANY REVISION FAILS; "0..." REVISIONS ARE NOT KNOWN
+    """
+    def __init__(self, fail=None):
+        self.fail = fail or {}
+
+    def get_revisions(self, candidates):
+        return [self.get_minimal_revision(c) for c in candidates]
+
+    def get_minimal_revision(self, candidate):
+        rev = candidate.changeset.id
+        if rev in self.fail:
+            Log.error("can not get {{rev}}", rev=rev, code=self.fail[rev])
+        if rev.startswith("0"):
+            return Null
+        return wrap({"branch": {"name": "try"}, "changeset": {"id": rev, "id12": rev[:12]}, "push": {"date": 1500000000}})
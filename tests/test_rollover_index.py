@@ -0,0 +1,133 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Contact: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import division
+from __future__ import unicode_literals
+
+from jx_elasticsearch.elasticsearch import ID, get_encoder
+from jx_elasticsearch.rollover_index import CHUNK_SIZE, RolloverIndex, fix
+from jx_elasticsearch.typed_inserter import TypedInserter
+from mo_dots import Data, Null, coalesce, wrap
+from mo_future import text
+from mo_json import json2value
+from mo_logs import Log
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from pyLibrary.aws.s3 import KEY_IS_WRONG_FORMAT
+
+RECORD = {"_id": "tc.1234:5678.0", "job": {"id": 5678, "name": "test"}, "run": {"suite": "mochitest"}}
+LINE = '{"_id":"tc.1234:5678.0","job":{"id":5678,"name":"test"},"run":{"suite":"mochitest"}}'
+
+
+class TestRolloverIndex(FuzzyTestCase):
+
+    def test_passthrough_setting(self):
+        self.assertEqual(_rollover(typed=False, id=ID)._passthrough(), True)
+        self.assertEqual(_rollover(typed=False, id="_id")._passthrough(), True)
+        self.assertEqual(_rollover(typed=False, id={"field": "job.id"})._passthrough(), False)
+        self.assertEqual(_rollover(typed=True, id=ID)._passthrough(), False)
+        self.assertEqual(_rollover(typed=True, id={"field": "job.id"})._passthrough(), False)
+
+    def test_untyped_passthrough(self):
+        row, _ = fix("key", 1, LINE, Null, None, None, passthrough=True)
+        self.assertEqual(row["id"], "tc.1234:5678.0")
+        self.assertIn("json", row)
+
+        id, _, json = get_encoder(wrap(ID))(row)
+        self.assertEqual(id, "tc.1234:5678.0")
+        self.assertEqual(json2value(json), {"job": {"id": 5678, "name": "test"}, "run": {"suite": "mochitest"}})
+        self.assertNotIn("_id", json2value(json))
+
+    def test_typed_encoder(self):
+        # TREEHERDER: TYPED, WITH job.id AS THE ES _id
+        row, _ = fix("key", 1, LINE, Null, None, None, passthrough=False)
+        self.assertNotIn("id", row)
+        self.assertIn("value", row)
+
+        encoder = TypedInserter(None, Data(field="job.id"))
+        id, _, json = encoder.typed_encode(row)
+        self.assertEqual(id, "5678")
+        self.assertEqual(json2value(json).run.suite, {"~s~": "mochitest"})
+
+        # THE S3 _id IS NOT THE ES _id HERE, SO PASS-THROUGH ROWS CAN NOT BE USED
+        passthrough_row, _ = fix("key", 1, LINE, Null, None, None, passthrough=True)
+        self.assertRaises("to match one given", encoder.typed_encode, passthrough_row)
+
+    def test_default_is_decoded(self):
+        row, _ = fix("key", 1, LINE, Null, None, None)
+        self.assertEqual(row, {"value": RECORD})
+
+    def test_copy_in_chunks(self):
+        keys = ["1:" + text(k) for k in range(10)]
+        index, queue = _copier()
+        done = []
+        num = index.copy(keys, _Source(3 * CHUNK_SIZE + 7), done_copy=lambda: done.append(True))
+
+        self.assertEqual(num, len(keys) * (3 * CHUNK_SIZE + 7))
+        self.assertEqual(len(queue), num + 1)
+        ids = set(coalesce(r.get("id"), r.get("value", {}).get("_id")) for r in queue[:-1])
+        self.assertTrue(ids == set(k + "." + text(i) for k in keys for i in range(3 * CHUNK_SIZE + 7)))
+        # done_copy ONLY AFTER ALL THE ROWS
+        self.assertEqual(done, [])
+        queue[-1]()
+        self.assertEqual(done, [True])
+
+    def test_copy_with_failing_key(self):
+        keys = ["1:" + text(k) for k in range(10)]
+        index, queue = _copier()
+        done = []
+        index.copy(keys, _Source(100, fail="1:3"), done_copy=lambda: done.append(True))
+
+        self.assertEqual(len(queue), 9 * 100)  # NO done_copy
+        self.assertEqual(done, [])
+
+    def test_copy_with_bad_format(self):
+        keys = ["1:" + text(k) for k in range(10)]
+        index, queue = _copier()
+        index.copy(keys, _Source(100, fail="1:3", problem=KEY_IS_WRONG_FORMAT), done_copy=lambda: None)
+
+        self.assertEqual(len(queue), 9 * 100 + 1)
+        self.assertTrue(callable(queue[-1]))
+
+
+class _Source(object):
+    name = "test"
+
+    def __init__(self, num_lines, fail=None, problem="problem"):
+        self.num_lines = num_lines
+        self.fail = fail
+        self.problem = problem
+
+    def read_lines(self, key):
+        for i in range(self.num_lines):
+            if key == self.fail and i == self.num_lines // 2:
+                Log.error(self.problem)
+            yield '{"_id":"' + key + "." + text(i) + '","etl":{"id":' + text(i) + '}}'
+
+
+def _copier():
+    queue = []
+    index = _rollover(typed=False, id=ID)
+    index._get_queue = lambda row: _ListQueue(queue)
+    return index, queue
+
+
+class _ListQueue(object):
+    def __init__(self, list):
+        self.list = list
+
+    def add(self, value):
+        self.list.append(value)
+
+    def extend(self, values):
+        self.list.extend(values)
+
+
+def _rollover(typed, id):
+    output = object.__new__(RolloverIndex)
+    output.settings = wrap({"typed": typed, "id": id})
+    return output
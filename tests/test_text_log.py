@@ -0,0 +1,34 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Contact: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import division
+from __future__ import unicode_literals
+
+from activedata_etl.imports.text_log import tc_timestamp2Date
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_times.dates import Date
+
+
+class TestTextLog(FuzzyTestCase):
+
+    def test_tc_timestamps(self):
+        for value in [
+            "2016-10-04 17:09:02.626Z",
+            "2016-10-04 17:09:02.627Z",  # SAME SECOND AS PREVIOUS
+            "2016-10-04T17:09:03.770657Z",
+            "2016-10-04T17:09:03Z",
+            "1999-12-31 23:59:59.999999Z"
+        ]:
+            self.assertEqual(tc_timestamp2Date(value).unix, Date(value).unix, "expecting same as Date(" + value + ")")
+
+    def test_mozharness_timestamp(self):
+        self.assertEqual(tc_timestamp2Date("2016-11-10 20:23:12.172233").unix, 1478809392.172233)
+        self.assertEqual(tc_timestamp2Date("2016-07-11 21:35:08.2927233").unix, 1468272908.292723)
+
+    def test_unknown_format(self):
+        self.assertEqual(tc_timestamp2Date("2016-10-04 19:09:02 +0200").unix, Date("2016-10-04 19:09:02 +0200").unix)
@@ -0,0 +1,189 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Contact: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import division
+from __future__ import unicode_literals
+
+from time import sleep
+
+from mo_logs import Log
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_threads import Lock, Signal, Thread, Till, queues
+from mo_threads.queues import BATCH_SECONDS, MIN_BATCH_BYTES, ThreadedQueue
+
+NUM_BATCHES = 20
+BATCH_SIZE = 10
+ITEM_BYTES = 100 * 1000
+
+
+class TestThreadedQueue(FuzzyTestCase):
+
+    def test_post_push_in_order(self):
+        # EARLY BATCHES ARE THE SLOWEST, SO THEY FINISH OUT OF ORDER
+        slow = _SlowQueue(delay=lambda batch: 0.01 * ((NUM_BATCHES * BATCH_SIZE - batch[0]) % 7))
+        done = _fill(slow, num_senders=4)
+
+        self.assertEqual([i for i, _ in done], list(range(NUM_BATCHES)))
+        for i, unsent in done:
+            self.assertEqual(unsent, [], "post-push " + str(i) + " called before all earlier items were sent")
+        self.assertEqual(sorted(slow.sent), list(range(NUM_BATCHES * BATCH_SIZE)))
+        self.assertNotEqual(slow.sent, sorted(slow.sent))
+
+    def test_post_push_after_rejection(self):
+        slow = _SlowQueue(delay=lambda batch: 0.01, reject=[3 * BATCH_SIZE])
+        done = _fill(slow, num_senders=4, rejected=lambda e: "rejected" in e)
+
+        self.assertEqual([i for i, _ in done], list(range(NUM_BATCHES)))
+        for i, unsent in done:
+            self.assertEqual(unsent, [], "post-push " + str(i) + " called before all earlier items were sent")
+        self.assertEqual(sorted(slow.sent), list(range(NUM_BATCHES * BATCH_SIZE)))
+
+        # THE REJECTED BATCH WAS SENT LATER, AND THE BATCHES AFTER THE REJECTION WERE HALVED
+        self.assertEqual(slow.rejected, [list(range(3 * BATCH_SIZE, 4 * BATCH_SIZE))])
+        self.assertIn(list(range(3 * BATCH_SIZE, 4 * BATCH_SIZE)), slow.batches)
+        self.assertLessEqual(min(len(b) for b in slow.batches), BATCH_SIZE // 2)
+
+    def test_sender_slower_than_add_timeout(self):
+        errors = []
+
+        def error_target(e, buffer):
+            # LIKE THE elasticsearch HANDLER, GIVE UP ON THE BUFFER
+            errors.append(e)
+            del buffer[:]
+
+        # THE FIRST BATCHES TAKE LONGER THAN A WRITER WILL WAIT FOR A FULL QUEUE
+        slow = _SlowQueue(delay=lambda batch: 1 if batch[0] < 3 * BATCH_SIZE else 0.01)
+        old_wait_time, queues.DEFAULT_WAIT_TIME = queues.DEFAULT_WAIT_TIME, 0.2
+        try:
+            done = _fill(slow, num_senders=2, max_size=2 * NUM_BATCHES * BATCH_SIZE, error_target=error_target)
+        finally:
+            queues.DEFAULT_WAIT_TIME = old_wait_time
+
+        self.assertEqual(errors, [])
+        self.assertEqual([i for i, _ in done], list(range(NUM_BATCHES)))
+        for i, unsent in done:
+            self.assertEqual(unsent, [], "post-push " + str(i) + " called before all earlier items were sent")
+        self.assertEqual(sorted(slow.sent), list(range(NUM_BATCHES * BATCH_SIZE)))
+
+    def test_batches_cut_at_bytes(self):
+        slow = _SlowQueue(delay=lambda batch: 0)
+        with ThreadedQueue("test", slow, batch_size=100, period=60, silent=True, sizer=lambda v: ITEM_BYTES, batch_bytes=3.5 * ITEM_BYTES) as queue:
+            queue.extend(range(30))
+
+        self.assertEqual(sorted(slow.sent), list(range(30)))
+        self.assertEqual(max(len(b) for b in slow.batches), 3)
+
+    def test_writers_block_at_max_bytes(self):
+        slow = _BlockedQueue()
+        added = []
+
+        def writer(please_stop):
+            for i in range(20):
+                queue.add(i)
+                added.append(i)
+
+        with ThreadedQueue("test", slow, batch_size=1, max_size=1000, period=60, silent=True, sizer=lambda v: ITEM_BYTES, max_bytes=5 * ITEM_BYTES) as queue:
+            thread = Thread.run("writer", writer)
+            Till(seconds=1).wait()
+            # ONE ITEM IS BEING SENT, FIVE FILL THE QUEUE
+            self.assertEqual(len(added), 6)
+            self.assertEqual(queue.num_bytes, 5 * ITEM_BYTES)
+
+            slow.unblock.go()
+            thread.join()
+        self.assertEqual(slow.sent, list(range(20)))
+
+    def test_slow_pushes_shrink_batch_bytes(self):
+        with ThreadedQueue("test", _SlowQueue(delay=lambda batch: 0), period=60, silent=True, sizer=len, batch_bytes=100 * MIN_BATCH_BYTES) as queue:
+            queue._sent(10, queue.batch_bytes, 2 * BATCH_SECONDS)
+            self.assertEqual(queue.batch_bytes, 50 * MIN_BATCH_BYTES)
+
+            for _ in range(20):
+                queue._sent(10, queue.batch_bytes, 10 * BATCH_SECONDS)
+            self.assertEqual(queue.batch_bytes, MIN_BATCH_BYTES)
+
+    def test_fast_pushes_grow_batch_bytes(self):
+        with ThreadedQueue("test", _SlowQueue(delay=lambda batch: 0), period=60, silent=True, sizer=len, batch_bytes=2 * MIN_BATCH_BYTES) as queue:
+            queue.batch_bytes = MIN_BATCH_BYTES
+
+            # SMALL BATCHES SAY NOTHING ABOUT HOW BIG A BATCH COULD BE
+            queue._sent(10, 10, 0.1)
+            self.assertEqual(queue.batch_bytes, MIN_BATCH_BYTES)
+
+            queue._sent(10, queue.batch_bytes, 0.1)
+            self.assertEqual(queue.batch_bytes, int(MIN_BATCH_BYTES * 1.1))
+
+            for _ in range(20):
+                queue._sent(10, queue.batch_bytes, 0.1)
+            self.assertEqual(queue.batch_bytes, 2 * MIN_BATCH_BYTES)
+
+            # NEITHER FAST NOR SLOW
+            queue._sent(10, queue.batch_bytes, BATCH_SECONDS)
+            self.assertEqual(queue.batch_bytes, 2 * MIN_BATCH_BYTES)
+
+
+def _fill(slow, **kwargs):
+    """
+    ADD NUM_BATCHES OF ITEMS, EACH FOLLOWED BY A POST-PUSH FUNCTION
+    :return: LIST OF (batch number, items added before it, but not yet sent) IN THE ORDER CALLED
+    """
+    done = []
+
+    def post_push(i):
+        def output():
+            with slow.lock:
+                done.append((i, [v for v in range((i + 1) * BATCH_SIZE) if v not in slow.sent]))
+        return output
+
+    # LONG period, SO ONLY batch_size DECIDES THE BATCHES
+    with ThreadedQueue("test", slow, batch_size=BATCH_SIZE, period=60, silent=True, **kwargs) as queue:
+        for i in range(NUM_BATCHES):
+            queue.extend(range(i * BATCH_SIZE, (i + 1) * BATCH_SIZE))
+            queue.add(post_push(i))
+    return done
+
+
+class _SlowQueue(object):
+    def __init__(self, delay, reject=()):
+        self.lock = Lock()
+        self.delay = delay
+        self.reject = set(reject)  # FIRST ITEM OF BATCHES TO REJECT, ONCE
+        self.sent = []
+        self.batches = []
+        self.rejected = []
+
+    def extend(self, batch):
+        batch = list(batch)
+        with self.lock:
+            if batch[0] in self.reject:
+                self.reject.remove(batch[0])
+                self.rejected.append(batch)
+                Log.error("rejected")
+        sleep(self.delay(batch))
+        with self.lock:
+            self.batches.append(batch)
+            self.sent.extend(batch)
+
+    def add(self, value):
+        pass
+
+
+class _BlockedQueue(object):
+    """
+    SEND NOTHING UNTIL unblock
+    """
+    def __init__(self):
+        self.unblock = Signal()
+        self.sent = []
+
+    def extend(self, batch):
+        self.unblock.wait()
+        self.sent.extend(batch)
+
+    def add(self, value):
+        pass
@@ -9,6 +9,10 @@
 from __future__ import division
 from __future__ import unicode_literals
 
+from activedata_etl.transforms.unittest_logs_to_sink import accumulate_logs
+from mo_files import File
+from mo_http.big_data import GzipLines
+from mo_json import json2value, value2json
 from mo_testing.fuzzytestcase import FuzzyTestCase
 
 false = False
@@ -18,3 +22,57 @@ class TestUnittestLogsToSink(FuzzyTestCase):
 
     def test_specif_url(self):
         url = "http://queue.taskcluster.net/v1/task/Izw-lZINTFqQsnnrv5N1UQ/artifacts/public/test_info//mochitest-devtools-chrome-chunked_raw.log"
+
+    def test_accumulate_51586(self):
+        # THE FIRST TWO LINES ARE THE ETL HEADER AND THE BUILDBOT SUMMARY, THE REST IS THE STRUCTURED LOG
+        content = File("tests/resources/51586_5124145.52.json.gz").read_bytes()
+        lines = [l.decode("utf8") for l in list(GzipLines(content))[2:]]
+        summary = accumulate_logs("51586_5124145.52", "url", lines, "mochitest", None)
+        result = json2value(value2json({"stats": summary.stats, "tests": sorted(summary.tests, key=lambda t: t.test)}))
+
+        # SUMMARY MADE BY THE Data-WRAPPED IMPLEMENTATION, BEFORE THE RAW-dict FAST PATH
+        content = File("tests/resources/51586_5124145.52.summary.json.gz").read_bytes()
+        expected = json2value("".join(l.decode("utf8") for l in GzipLines(content)))
+        self.assertEqual(result, expected, digits=3)
+        self.assertEqual(expected, result, digits=3)
+
+    def test_accumulate_actions(self):
+        lines = [
+            '{"action": "suite_start", "time": 1450098800000, "tests": {"default": ["a.html"], "g1": ["b.html"]}, "run_info": {"debug": true}}',
+            '{"action": "test_start", "test": "a.html", "time": 1450098801000, "source": "mochitest"}',
+            '{"action": "test_status", "test": "a.html", "subtest": "one", "status": "PASS", "time": 1450098802000}',
+            '{"action": "test_status", "test": "a.html", "subtest": "two", "status": "FAIL", "expected": "PASS", "message": "boom", "time": 1450098803000}',
+            '{"action": "test_status", "test": "a.html", "subtest": "two", "status": "FAIL", "expected": "PASS", "message": "boom", "time": 1450098803500}',
+            '{"action": "log", "level": "INFO", "message": "general", "time": 1450098799000}',
+            '{"action": "test_end", "test": "a.html", "status": "OK", "time": 1450098804000}',
+            '',
+            'not json',
+            '{"action": "test_start", "test": ["b.html", "c.html"], "time": 1450098805000}',
+            '{"action": "crash", "signature": "sig", "time": 1450098806000}',
+            '{"action": "test_end", "test": ["b.html", "c.html"], "status": "TIMEOUT", "expected": "OK", "time": 1450098807000}',
+            '{"action": "unknown_action", "time": 1450098809000}',
+            '{"action": "suite_end", "time": 1450098810000}',
+        ]
+        summary = accumulate_logs("k", "url", lines, "mochitest", None)
+        stats = json2value(value2json(summary.stats))
+        tests = {t.test: t for t in json2value(value2json(summary.tests))}
+
+        self.assertEqual(summary.groups, ["g1"])
+        self.assertEqual(summary.run_info, {"debug": true})
+        self.assertEqual(stats, {
+            "action": {"crash": 1, "log": 1, "suite_end": 1, "suite_start": 1, "test_end": 2, "test_start": 2, "test_status": 3, "unknown_action": 1},
+            "bad_lines": 1,
+            "lines": 13,
+            "start_time": 1450098799,
+            "end_time": 1450098810,
+            "status": {"ok": 1, "timeout": 1},
+            "total": 3
+        })
+        self.assertEqual(tests["a.html"], {
+            "ok": false,
+            "duration": 3,
+            "stats": {"pass": 1, "fail": 2},
+            "subtests": [{"name": "two", "ok": false, "repeat": 1, "status": "fail", "expected": "pass", "message": "boom"}]
+        })
+        self.assertEqual(tests["b.html c.html"], {"ok": false, "status": "TIMEOUT", "duration": 2})
+        self.assertEqual(tests["!!SUITE CRASH!!"], {"ok": false, "crash": [true], "missing_test_start": true})